@@ -4,22 +4,28 @@ from pydantic import BaseModel
 from datetime import datetime, timedelta
 from typing import Optional
 
-from ai_tutor_platform.db.pg_client import get_db_connection
-from passlib.context import CryptContext
+from jose import jwt, JWTError
+from ai_tutor_platform.db import repository
+from ai_tutor_platform.config.configuration import config_instance
+from ai_tutor_platform.modules.auth.principal_cache import principal_cache
+from ai_tutor_platform.modules.auth.password_hashing import pwd_context, password_hasher, HasherBusyError
 
 router = APIRouter()
 
-# Password hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # OAuth2 setup for token-based authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-# --- Token Management (replace with actual JWT library if deploying seriously) ---
-# For simplicity, we'll use a basic token system. In production, use JWT.
-SECRET_KEY = "your-super-secret-key" # CHANGE THIS IN PRODUCTION! Use an environment variable.
+# --- Token Management ---
+# Access tokens are signed JWTs, so validating one needs no database round trip.
+SECRET_KEY = config_instance.get_auth_secret_key()
+if not SECRET_KEY:
+    # A well-known fallback key would let anyone mint tokens for any user, so refuse to start
+    raise RuntimeError(
+        "SECRET_KEY is not set. Set it to a long random string, e.g. "
+        "python -c \"import secrets; print(secrets.token_urlsafe(48))\""
+    )
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = config_instance.get_access_token_expire_minutes()
 
 class Token(BaseModel):
     access_token: str
@@ -31,6 +37,7 @@ class TokenData(BaseModel):
 class UserInDB(BaseModel):
     username: str
     hashed_password: str
+    email: Optional[str] = None
 
 class UserCreate(BaseModel):
     username: str
@@ -47,92 +54,107 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def get_user(username: str):
-    conn = None
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT username, hashed_password FROM users WHERE username = %s", (username,))
-        user_data = cur.fetchone()
-        if user_data:
-            return UserInDB(username=user_data[0], hashed_password=user_data[1])
-        return None
-    finally:
-        if conn:
-            cur.close()
-            conn.close()
+async def get_user(username: str) -> Optional[UserInDB]:
+    user_data = await repository.get_user(username)
+    return UserInDB(**user_data) if user_data else None
+
+async def get_principal(username: str) -> Optional["User"]:
+    """Public view of a user (no password hash), as kept in the principal cache."""
+    user = await get_user(username)
+    return User(username=user.username, email=user.email) if user else None
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    # This is a very basic token. For production, use `jose` for JWT:
-    # encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    # For now, let's just make a simple string, but BE AWARE THIS IS NOT SECURE FOR REAL USE
-    return f"{to_encode['username']}|{expire.isoformat()}" # Simple token for now
+        expire = now + timedelta(minutes=15)
+    to_encode.update({"exp": expire, "iat": now})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """
+    Validates the JWT signature and expiry in-process; the claims carry everything the
+    routes need, so no query runs per request. FastAPI caches dependencies per request,
+    so the router-level and handler-level Depends share this one call.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    # For production, you'd decode JWT here
     try:
-        username, expiry_str = token.split('|')
-        expire = datetime.fromisoformat(expiry_str)
-        if datetime.utcnow() >= expire:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        username = payload.get("sub")
+        if not username:
             raise credentials_exception
-    except Exception:
+    except JWTError:
         raise credentials_exception
 
-    user = get_user(username)
+    if not config_instance.get_auth_verify_user_in_db():
+        return User(username=username, email=payload.get("email"))
+
+    # Optional existence check, answered from the principal cache whenever possible
+    user = await principal_cache.get_or_load(username, get_principal)
     if user is None:
         raise credentials_exception
-    return User(username=user.username, email=None) # Return basic user info
+    return user
+
+def _hasher_busy_exception():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many logins in progress. Please try again in a moment.",
+        headers={"Retry-After": "1"},
+    )
 
 # --- Routes ---
 @router.post("/signup", response_model=User)
-def register_user(user: UserCreate):
-    db_user = get_user(user.username)
+async def register_user(user: UserCreate):
+    db_user = await get_user(user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    
-    conn = None
+
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        hashed_password = get_password_hash(user.password)
-        cur.execute(
-            "INSERT INTO users (username, hashed_password, email) VALUES (%s, %s, %s)",
-            (user.username, hashed_password, user.email)
-        )
-        conn.commit()
+        hashed_password = await password_hasher.hash(user.password)
+    except HasherBusyError:
+        raise _hasher_busy_exception()
+    try:
+        await repository.create_user(user.username, hashed_password, user.email)
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to register user: {e}")
-    finally:
-        if conn:
-            cur.close()
-            conn.close()
-    
+
+    # Drop any cached "no such user" answer for this name
+    principal_cache.invalidate(user.username)
     return User(username=user.username, email=user.email)
 
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = get_user(form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await get_user(form_data.username)
+    # bcrypt runs on the hashing pool, never on the event loop
+    try:
+        if user:
+            valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+        else:
+            await password_hasher.dummy_verify()
+            valid, new_hash = False, None
+    except HasherBusyError:
+        raise _hasher_busy_exception()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # The stored hash used an older cost setting; upgrade it now that we know the password
+        try:
+            await repository.update_password_hash(user.username, new_hash)
+        except Exception as e:
+            print(f"Could not upgrade password hash for {user.username}: {e}")
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"username": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "email": user.email}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
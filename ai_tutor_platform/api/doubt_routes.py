@@ -1,21 +1,161 @@
-from fastapi import APIRouter, Depends # Added Depends
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request # Added Depends
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from ai_tutor_platform.modules.doubt_solver.file_handler import solve_doubt
-from ai_tutor_platform.db.pg_client import save_file_doubt # Changed to pg_client
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError: # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+from ai_tutor_platform.modules.doubt_solver.file_handler import (
+    asolve_doubt,
+    extract_document,
+    load_document,
+    SUPPORTED_UPLOAD_TYPES
+)
+from ai_tutor_platform.db.write_behind import record_file_doubt
 from ai_tutor_platform.api.auth_routes import get_current_user, User # Import User model and dependency
+from ai_tutor_platform.config.configuration import config_instance
 
 router = APIRouter()
 
+# Allowance for multipart boundaries and part headers when checking Content-Length
+UPLOAD_OVERHEAD_BYTES = 64 * 1024
+
 class DoubtRequest(BaseModel):
     # user_id is no longer passed in the request body
     file_name: str
-    context: str
     question: str
+    # Either the id returned by /doubt/upload or the raw extracted text
+    doc_id: Optional[str] = None
+    context: Optional[str] = None
+
+class _UploadReceiver:
+    """
+    Streaming multipart parser for /doubt/upload: fed the raw request body chunk by chunk,
+    it returns the bytes of the part named "file" as they arrive and ignores any other part.
+    `filename` is set once that part's headers have been read.
+    """
+    def __init__(self, boundary: bytes):
+        self.filename = None
+        self._chunks = []
+        self._in_file = False
+        self._headers = {}
+        self._field = b""
+        self._value = b""
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        self._parser.write(chunk)
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+    def finish(self):
+        self._parser.finalize()
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field, self._value = b"", b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if options.get(b"name") == b"file" and self.filename is None:
+            self.filename = options.get(b"filename", b"").decode("utf-8", errors="replace")
+            self._in_file = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self._chunks.append(data[start:end])
+
+    def _on_part_end(self):
+        self._in_file = False
+
+
+@router.post("/upload")
+async def upload_document(request: Request, current_user: User = Depends(get_current_user)):
+    """
+    Receives a document as multipart form data with the file in a part named "file". The
+    body is parsed as it streams in: the file is hashed and written to a single temp file
+    chunk by chunk, and an upload over the size limit is refused from its Content-Length
+    before the body is read (or as soon as it crosses the limit). The text is then extracted
+    in the threadpool. Returns a `doc_id` to pass to /doubt/solve.
+    """
+    max_bytes = config_instance.get_doubt_max_upload_bytes()
+    too_large = HTTPException(status_code=413, detail=f"File is larger than the {max_bytes // (1024 * 1024)} MB upload limit.")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes + UPLOAD_OVERHEAD_BYTES:
+        raise too_large
+
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Upload the document as multipart/form-data in a field named 'file'.")
+
+    receiver = _UploadReceiver(options[b"boundary"])
+    digest = hashlib.sha256()
+    size = 0
+    tmp = None
+    try:
+        async for body_chunk in request.stream():
+            chunks = receiver.feed(body_chunk)
+            if receiver.filename is not None and tmp is None:
+                suffix = Path(receiver.filename).suffix.lower()
+                if suffix not in SUPPORTED_UPLOAD_TYPES:
+                    raise HTTPException(status_code=400, detail="Unsupported file format. Upload a PDF, TXT, PNG or JPG file.")
+                tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+            for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise too_large
+                digest.update(chunk)
+                await run_in_threadpool(tmp.write, chunk)
+        receiver.finish()
+        if tmp is None:
+            raise HTTPException(status_code=422, detail="No file found in the upload's 'file' field.")
+
+        tmp.close()
+        doc_id, text = await run_in_threadpool(extract_document, tmp.name, digest.hexdigest())
+    finally:
+        if tmp is not None:
+            tmp.close()
+            os.unlink(tmp.name)
+
+    if doc_id is None:
+        raise HTTPException(status_code=422, detail=f"File extraction error: {text}")
+    return {"doc_id": doc_id, "file_name": receiver.filename, "characters": len(text)}
 
 @router.post("/solve")
 # Protect this route
-def solve_doubt_from_file(request: DoubtRequest, current_user: User = Depends(get_current_user)):
-    result = solve_doubt(request.context, request.question)
+async def solve_doubt_from_file(request: DoubtRequest, current_user: User = Depends(get_current_user)):
+    if request.doc_id:
+        context = await run_in_threadpool(load_document, request.doc_id)
+        if context is None:
+            raise HTTPException(status_code=404, detail="Document not found or expired. Please upload it again.")
+    elif request.context is not None:
+        context = request.context
+    else:
+        raise HTTPException(status_code=422, detail="Provide either 'doc_id' (from /doubt/upload) or 'context'.")
+
+    result = await asolve_doubt(context, request.question, current_user.username)
     # Use current_user.username for saving the file doubt
-    save_file_doubt(current_user.username, request.file_name, request.question, result)
+    await record_file_doubt(current_user.username, request.file_name, request.question, result)
     return {"answer": result}
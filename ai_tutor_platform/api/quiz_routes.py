@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, BackgroundTasks
 from pydantic import BaseModel
 from typing import List, Dict, Any 
-from ai_tutor_platform.db.pg_client import save_quiz_response, save_user_progress  
+from ai_tutor_platform.db.repository import save_quiz_submission
 from ai_tutor_platform.api.auth_routes import get_current_user, User
-from ai_tutor_platform.modules.quiz.quiz_generator import generate_quiz
+from ai_tutor_platform.modules.quiz.quiz_generator import agenerate_quiz
+from ai_tutor_platform.modules.quiz.question_bank import draw_quiz, deposit_questions
+from ai_tutor_platform.config.configuration import config_instance
 
 router = APIRouter()
 
 class QuizRequest(BaseModel):
     topic: str
     num_questions: int = 5
+    fresh: bool = False # Skip the shared response cache to get a new set of questions
 
 class QuizSubmission(BaseModel):
     subject: str
@@ -17,14 +20,23 @@ class QuizSubmission(BaseModel):
     user_answers: List[str]
 
 @router.post("/generate") 
-def create_quiz(request: QuizRequest, current_user: User = Depends(get_current_user)):
-    result = generate_quiz(request.topic, request.num_questions)
+async def create_quiz(request: QuizRequest, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
+    # Serve from the pre-generated question bank when it has stock; fall back to live generation
+    if config_instance.get_quiz_bank_enabled() and not request.fresh:
+        banked = await draw_quiz(request.topic, request.num_questions, current_user.username)
+        if banked is not None:
+            return {"quiz": banked}
+
+    result = await agenerate_quiz(request.topic, request.num_questions, use_cache=not request.fresh, user_id=current_user.username)
+    if config_instance.get_quiz_bank_enabled():
+        background_tasks.add_task(deposit_questions, request.topic, result)
     return {"quiz": result}
 
 @router.post("/submit") 
-def submit_quiz(submission: QuizSubmission, current_user: User = Depends(get_current_user)):
+async def submit_quiz(submission: QuizSubmission, current_user: User = Depends(get_current_user)):
     correct_count = 0
     detailed_results = []
+    attempt_rows = []
     total_questions = len(submission.questions)  
 
     for q, user_ans in zip(submission.questions, submission.user_answers):
@@ -37,12 +49,13 @@ def submit_quiz(submission: QuizSubmission, current_user: User = Depends(get_cur
             "user_answer": user_ans,
             "is_correct": is_correct
         })
- 
-    save_quiz_response(current_user.username, submission.subject, submission.questions, submission.user_answers)
- 
-    save_user_progress(
-        user_id=current_user.username,  
+        attempt_rows.append((q.get("question", ""), q.get("options", []), q.get("answer", ""), user_ans, is_correct))
+
+    # Attempts and progress are written together, reusing the grading above
+    await save_quiz_submission(
+        user_id=current_user.username,
         subject=submission.subject,
+        attempts=attempt_rows,
         score=correct_count,
         total=total_questions
     )
@@ -52,4 +65,3 @@ def submit_quiz(submission: QuizSubmission, current_user: User = Depends(get_cur
         "total": total_questions,
         "details": detailed_results
     }
-
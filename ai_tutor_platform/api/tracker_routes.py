@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends # Added Depends
 from pydantic import BaseModel
-from ai_tutor_platform.db.pg_client import save_user_progress, get_user_progress # Changed to pg_client
+from ai_tutor_platform.db.repository import save_user_progress, get_user_progress, get_user_progress_summary
 from ai_tutor_platform.api.auth_routes import get_current_user, User # Import User model and dependency
 
 router = APIRouter()
@@ -17,15 +17,21 @@ class ScoreInput(BaseModel):
 
 @router.post("/record")
 # Protect this route
-def save_score(data: ScoreInput, current_user: User = Depends(get_current_user)):
+async def save_score(data: ScoreInput, current_user: User = Depends(get_current_user)):
     # Use current_user.username for saving user progress
-    save_user_progress(current_user.username, data.subject, data.score, data.total)
+    await save_user_progress(current_user.username, data.subject, data.score, data.total)
     return {"message": "Score recorded successfully."}
 
 @router.post("/progress")
 # Protect this route
 # No request body needed, user_id comes from authentication
-def fetch_progress(current_user: User = Depends(get_current_user)):
+async def fetch_progress(current_user: User = Depends(get_current_user)):
     # Use current_user.username for fetching progress
-    progress = get_user_progress(current_user.username)
+    progress = await get_user_progress(current_user.username)
     return {"progress": progress}
+
+@router.get("/summary")
+async def fetch_progress_summary(current_user: User = Depends(get_current_user)):
+    # Read from the per-subject rollup, so the cost does not grow with the number of attempts
+    summary = await get_user_progress_summary(current_user.username)
+    return {"summary": summary}
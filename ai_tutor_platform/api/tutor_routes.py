@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends # Added Depends
+import json
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query # Added Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from ai_tutor_platform.modules.tutor.chat_tutor import ask_tutor
+from ai_tutor_platform.modules.tutor.chat_tutor import aask_tutor, astream_tutor
+from ai_tutor_platform.modules.tutor.memory import tutor_memory
+from ai_tutor_platform.llm.scheduler import llm_scheduler, Priority
 from ai_tutor_platform.api.auth_routes import get_current_user, User # Import User model and dependency
-from ai_tutor_platform.db.pg_client import save_chat, get_chat_history
+from ai_tutor_platform.db.repository import get_chat_history_page
+from ai_tutor_platform.db.pagination import encode_cursor, decode_cursor
+from ai_tutor_platform.db.write_behind import record_chat
+from ai_tutor_platform.config.configuration import config_instance
 
 router = APIRouter()
 
@@ -10,16 +18,101 @@ class QuestionRequest(BaseModel):
     question: str
 
 @router.post("/ask")
-def handle_question(request: QuestionRequest, current_user: User = Depends(get_current_user)):
-    response = ask_tutor(request.question)
-    save_chat(current_user.username, request.question, response)
+async def handle_question(request: QuestionRequest, current_user: User = Depends(get_current_user)):
+    response = await aask_tutor(request.question, current_user.username)
+    # Buffered and written in a batch, so the response does not wait on a commit
+    await record_chat(current_user.username, request.question, response)
+    tutor_memory.note_turn(current_user.username, request.question, response) # May start a background summary refresh
     return {"response": response}
 
+def _sse_event(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@router.post("/ask/stream")
+async def handle_question_stream(request: QuestionRequest, current_user: User = Depends(get_current_user)):
+    """
+    Server-Sent-Events variant of /ask. Each chunk is sent as a `data:` event as soon as the
+    model produces it; the full answer is saved once, after the stream has finished.
+    """
+    # Turn the request away with 503 before the 200 stream starts if the LLM queue is full
+    llm_scheduler.check_admission(current_user.username, Priority.INTERACTIVE)
+    async def event_stream():
+        parts = []
+        try:
+            async for token in astream_tutor(request.question, current_user.username):
+                parts.append(token)
+                yield _sse_event({"token": token})
+        except Exception as e:
+            yield _sse_event({"detail": f"An error occurred while processing your question: {str(e)}"}, event="error")
+            return
+
+        response = "".join(parts).strip()
+        await record_chat(current_user.username, request.question, response)
+        tutor_memory.note_turn(current_user.username, request.question, response)
+        yield _sse_event({"response": response}, event="done")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _sync_position(rows: List[Dict[str, Any]]) -> int:
+    """Sync position for a newest-first default page: its newest settled turn."""
+    for row in rows:
+        if row["settled"]:
+            return row["id"]
+    # Nothing settled yet: sync from just before the oldest turn fetched
+    return rows[-1]["id"] - 1 if rows else 0
+
+
 @router.get("/history")  
-def get_chat_history_for_user(current_user: User = Depends(get_current_user)):
-    history = get_chat_history(current_user.username)
+async def get_chat_history_for_user(
+    limit: Optional[int] = Query(None, ge=1),
+    before: Optional[str] = Query(None, description="next_cursor from a previous page, to fetch older turns"),
+    since: Optional[str] = Query(None, description="sync_cursor from a previous call, to fetch only newer turns"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Keyset-paginated chat history, returned oldest first within the page.
+    Without a cursor the latest `limit` turns are returned. `next_cursor` pages further back
+    (null once the start is reached); `sync_cursor` can be passed back as `since` to fetch
+    only what was added afterwards. It stops short of turns written in the last
+    sync_grace_seconds (see get_chat_history_page), so those can be returned again by the
+    first sync after a default page.
+    """
+    if before and since:
+        raise HTTPException(status_code=422, detail="Pass either 'before' or 'since', not both.")
+    limit = min(limit or config_instance.get_history_page_size(), config_instance.get_history_max_page_size())
+    try:
+        before_key = decode_cursor(before) if before else None
+        since_key = decode_cursor(since) if since else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # One extra row tells us whether another page exists without a COUNT query
+    fetched = await get_chat_history_page(current_user.username, limit + 1, before=before_key, since=since_key)
+    has_more = len(fetched) > limit
+    rows = fetched[:limit]
+    if since_key is None:
+        rows.reverse() # The newest-first page is presented in chronological order
+
     formatted_history = []
-    for role, message in history:
-        formatted_history.append({"role": role, "message": message})
-    return {"history": formatted_history}
+    for row in rows:
+        formatted_history.append({"role": "user", "message": row["question"]})
+        formatted_history.append({"role": "ai", "message": row["answer"]})
 
+    if since_key is not None:
+        next_cursor = None
+        sync_cursor = encode_cursor(rows[-1]["id"]) if rows else encode_cursor(since_key)
+    else:
+        next_cursor = encode_cursor(rows[0]["id"]) if rows and has_more else None
+        # Only the first page knows the newest turn; older pages leave the sync position unchanged
+        sync_cursor = encode_cursor(_sync_position(fetched)) if before_key is None else None
+    return {
+        "history": formatted_history,
+        "next_cursor": next_cursor,
+        "sync_cursor": sync_cursor,
+        "has_more": has_more
+    }
@@ -0,0 +1,37 @@
+"""
+Rebuilds the user_subject_progress rollups from the user_progress history.
+
+Run once after deploying the rollup table, or whenever the two are suspected to have
+drifted (e.g. after manual edits to user_progress):
+
+    python -m ai_tutor_platform.db.backfill_rollups [--user USERNAME]
+"""
+import argparse
+import asyncio
+import time
+
+from ai_tutor_platform.db.repository import database, setup_db_schema, rebuild_progress_rollups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", help="only rebuild this user's rollups")
+    args = parser.parse_args()
+
+    written, elapsed = asyncio.run(_rebuild(args.user))
+    scope = f"user '{args.user}'" if args.user else "all users"
+    print(f"Rebuilt {written} subject rollups for {scope} in {elapsed:.2f}s.")
+
+
+async def _rebuild(user: str = None):
+    try:
+        await setup_db_schema() # Makes sure the rollup table exists
+        start = time.perf_counter()
+        written = await rebuild_progress_rollups(user)
+        return written, time.perf_counter() - start
+    finally:
+        await database.close()
+
+
+if __name__ == "__main__":
+    main()
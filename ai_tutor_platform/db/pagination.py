@@ -0,0 +1,21 @@
+import base64
+import json
+
+
+def encode_cursor(row_id: int) -> str:
+    """Opaque, URL-safe cursor for a chat turn's id keyset position."""
+    raw = json.dumps({"i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Inverse of encode_cursor. Cursors issued before pages were keyed on the id also carry
+    a timestamp ("t"), which is ignored. Raises ValueError for anything that is not a valid cursor.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return int(data["i"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
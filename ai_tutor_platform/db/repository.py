@@ -0,0 +1,509 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import List, Dict, Any, Optional
+
+import asyncpg
+
+from ai_tutor_platform.config.configuration import config_instance
+from ai_tutor_platform.monitoring.metrics import DB_POOL_WAIT_SECONDS, DB_POOL_IN_USE
+
+
+class Database:
+    """
+    Owns the asyncpg pool used by the API. The app opens it in its startup hook and closes
+    it on shutdown; anything that runs earlier (or outside the app, e.g. a CLI) gets it
+    created on first use. Every pooled connection keeps its own prepared-statement cache,
+    so the fixed SQL strings below are parsed and planned once per connection.
+    """
+    def __init__(self):
+        self._pool = None
+        self._lock = None
+
+    async def connect(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._pool is None:
+                statement_timeout = config_instance.get_db_statement_timeout_ms()
+                self._pool = await asyncpg.create_pool(
+                    dsn=config_instance.get_database_url(),
+                    min_size=config_instance.get_db_pool_min_size(),
+                    max_size=config_instance.get_db_pool_max_size(),
+                    command_timeout=config_instance.get_db_command_timeout_seconds(),
+                    statement_cache_size=config_instance.get_db_statement_cache_size(),
+                    max_inactive_connection_lifetime=config_instance.get_db_max_inactive_connection_lifetime(),
+                    server_settings={"statement_timeout": str(statement_timeout)} if statement_timeout else None
+                )
+                print("Database connection pool initialized.")
+        return self._pool
+
+    async def close(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await pool.close()
+
+    async def pool(self) -> asyncpg.Pool:
+        return self._pool or await self.connect()
+
+    @asynccontextmanager
+    async def connection(self):
+        pool = await self.pool()
+        start = time.perf_counter()
+        async with pool.acquire() as conn:
+            DB_POOL_WAIT_SECONDS.labels("asyncpg").observe(time.perf_counter() - start)
+            DB_POOL_IN_USE.labels("asyncpg").inc()
+            try:
+                yield conn
+            finally:
+                DB_POOL_IN_USE.labels("asyncpg").dec()
+
+    @asynccontextmanager
+    async def transaction(self):
+        """`async with database.transaction() as conn:` commits on exit and rolls back on error."""
+        async with self.connection() as conn:
+            async with conn.transaction():
+                yield conn
+
+
+database = Database()
+
+
+def _accuracy(score: int, total: int) -> Decimal:
+    if total <= 0:
+        return Decimal("0")
+    return (Decimal(score) * 100 / Decimal(total)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _rows_affected(status: str) -> int:
+    """Row count from a command status such as 'INSERT 0 12'."""
+    try:
+        return int(status.rsplit(" ", 1)[-1])
+    except (ValueError, AttributeError):
+        return 0
+
+
+# ------------ Schema ------------
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        username VARCHAR(255) UNIQUE NOT NULL,
+        hashed_password VARCHAR(255) NOT NULL,
+        email VARCHAR(255) UNIQUE,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS chat_history (
+        id SERIAL PRIMARY KEY,
+        user_id VARCHAR(255) NOT NULL,
+        question TEXT NOT NULL,
+        answer TEXT NOT NULL,
+        timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        inserted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    -- `timestamp` is when the turn happened; inserted_at is when its row was written
+    ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS inserted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP;
+    CREATE TABLE IF NOT EXISTS file_doubts (
+        id SERIAL PRIMARY KEY,
+        user_id VARCHAR(255) NOT NULL,
+        filename VARCHAR(255) NOT NULL,
+        question TEXT NOT NULL,
+        answer TEXT NOT NULL,
+        timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS quiz_attempts (
+        id SERIAL PRIMARY KEY,
+        user_id VARCHAR(255) NOT NULL,
+        subject VARCHAR(255) NOT NULL,
+        question TEXT NOT NULL,
+        options TEXT[] NOT NULL,
+        correct_answer VARCHAR(255) NOT NULL,
+        user_answer VARCHAR(255) NOT NULL,
+        is_correct BOOLEAN NOT NULL,
+        timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS user_progress (
+        id SERIAL PRIMARY KEY,
+        user_id VARCHAR(255) NOT NULL,
+        subject VARCHAR(255) NOT NULL,
+        score INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        accuracy NUMERIC(5, 2) NOT NULL,
+        timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS user_subject_progress (
+        user_id VARCHAR(255) NOT NULL,
+        subject VARCHAR(255) NOT NULL,
+        attempts INTEGER NOT NULL,
+        score_sum BIGINT NOT NULL,
+        total_sum BIGINT NOT NULL,
+        accuracy_sum NUMERIC(14, 2) NOT NULL,
+        last_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        PRIMARY KEY (user_id, subject)
+    );
+    CREATE TABLE IF NOT EXISTS llm_response_cache (
+        cache_key CHAR(64) PRIMARY KEY,
+        model_name VARCHAR(255) NOT NULL,
+        response TEXT NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS quiz_questions (
+        id SERIAL PRIMARY KEY,
+        subject VARCHAR(255) NOT NULL,
+        question TEXT NOT NULL,
+        options TEXT[] NOT NULL,
+        answer TEXT NOT NULL,
+        question_hash CHAR(40) NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (subject, question_hash)
+    );
+    CREATE TABLE IF NOT EXISTS extracted_texts (
+        cache_key VARCHAR(80) PRIMARY KEY,
+        file_type VARCHAR(16) NOT NULL,
+        extractor_version VARCHAR(16) NOT NULL,
+        char_count INTEGER NOT NULL,
+        byte_size INTEGER NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        last_accessed TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS tutor_memory (
+        user_id VARCHAR(255) PRIMARY KEY,
+        summary TEXT NOT NULL,
+        summarized_ts TIMESTAMP WITH TIME ZONE NOT NULL,
+        summarized_id INTEGER NOT NULL,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    -- Add indexes for performance
+    CREATE INDEX IF NOT EXISTS idx_chat_user_id ON chat_history (user_id);
+    DROP INDEX IF EXISTS idx_chat_user_ts_id;
+    CREATE INDEX IF NOT EXISTS idx_chat_user_id_id ON chat_history (user_id, id);
+    CREATE INDEX IF NOT EXISTS idx_file_user_id ON file_doubts (user_id);
+    CREATE INDEX IF NOT EXISTS idx_quiz_user_id ON quiz_attempts (user_id);
+    CREATE INDEX IF NOT EXISTS idx_progress_user_id ON user_progress (user_id);
+    CREATE INDEX IF NOT EXISTS idx_progress_subject ON user_progress (subject);
+    CREATE INDEX IF NOT EXISTS idx_llm_cache_created_at ON llm_response_cache (created_at);
+    CREATE INDEX IF NOT EXISTS idx_quiz_questions_subject ON quiz_questions (subject);
+    CREATE INDEX IF NOT EXISTS idx_quiz_user_question ON quiz_attempts (user_id, question);
+"""
+
+async def setup_db_schema():
+    async with database.connection() as conn:
+        await conn.execute(SCHEMA_SQL)
+    print("Database schema ensured.")
+
+# ------------ Users ------------
+async def get_user(username: str) -> Optional[Dict[str, Any]]:
+    async with database.connection() as conn:
+        row = await conn.fetchrow("SELECT username, hashed_password, email FROM users WHERE username = $1", username)
+    return dict(row) if row else None
+
+async def create_user(username: str, hashed_password: str, email: Optional[str] = None):
+    async with database.connection() as conn:
+        await conn.execute(
+            "INSERT INTO users (username, hashed_password, email) VALUES ($1, $2, $3)",
+            username, hashed_password, email
+        )
+
+async def update_password_hash(username: str, hashed_password: str):
+    async with database.connection() as conn:
+        await conn.execute("UPDATE users SET hashed_password = $1 WHERE username = $2", hashed_password, username)
+
+# ------------ Chat History ------------
+async def save_chat(user_id: str, question: str, answer: str, timestamp: Optional[datetime] = None):
+    """`timestamp` defaults to the insert time; the write-behind buffer passes the enqueue time."""
+    async with database.connection() as conn:
+        await conn.execute(
+            "INSERT INTO chat_history (user_id, question, answer, timestamp) "
+            "VALUES ($1, $2, $3, COALESCE($4::timestamptz, CURRENT_TIMESTAMP))",
+            user_id, question, answer, timestamp
+        )
+
+async def get_chat_history(user_id: str) -> List[Dict[str, Any]]:
+    """
+    Full history, oldest first, read through a server-side cursor in batches; interactive
+    callers should prefer get_chat_history_page.
+    """
+    history = []
+    async with database.transaction() as conn:
+        async for row in conn.cursor(
+            "SELECT question, answer FROM chat_history WHERE user_id = $1 ORDER BY id ASC",
+            user_id,
+            prefetch=500
+        ):
+            history.append({"role": "user", "message": row["question"]})
+            history.append({"role": "ai", "message": row["answer"]})
+    return history
+
+async def get_chat_history_page(user_id: str, limit: int, before: Optional[int] = None,
+                                since: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    One page of chat turns using keyset pagination on (user_id, id), served by
+    idx_chat_user_id_id, so the cost depends on `limit` and not on how long the history is.
+    Turns are ordered by id, i.e. in the order they were inserted. Not by timestamp: the
+    write-behind buffer stamps a turn when it finishes but inserts it up to a flush interval
+    later, so a turn stamped before a `since` position could land after it was read.
+
+    Ids are not committed in order either: the write-behind flusher of each API worker, its
+    direct-write fallback and unbuffered writes all insert concurrently, so a lower id can
+    become visible after a higher one. `since` reads therefore only return rows inserted at
+    least [HISTORY] sync_grace_seconds ago, and default pages flag those rows as `settled`;
+    a transaction that takes longer than the grace period to commit can still be skipped.
+    - default / `before`: the newest turns with an id below `before`, newest first.
+    - `since`: settled turns with an id above `since`, oldest first (incremental sync).
+    """
+    grace = config_instance.get_history_sync_grace_seconds()
+    async with database.connection() as conn:
+        if since is not None:
+            rows = await conn.fetch(
+                "SELECT id, question, answer, timestamp FROM chat_history "
+                "WHERE user_id = $1 AND id > $2 AND inserted_at < CURRENT_TIMESTAMP - $4::float8 * interval '1 second' "
+                "ORDER BY id ASC LIMIT $3",
+                user_id, since, limit, grace
+            )
+        elif before is not None:
+            rows = await conn.fetch(
+                "SELECT id, question, answer, timestamp FROM chat_history "
+                "WHERE user_id = $1 AND id < $2 ORDER BY id DESC LIMIT $3",
+                user_id, before, limit
+            )
+        else:
+            rows = await conn.fetch(
+                "SELECT id, question, answer, timestamp, "
+                "inserted_at < CURRENT_TIMESTAMP - $3::float8 * interval '1 second' AS settled "
+                "FROM chat_history WHERE user_id = $1 ORDER BY id DESC LIMIT $2",
+                user_id, limit, grace
+            )
+    return [dict(row) for row in rows]
+
+# ------------ Tutor memory ------------
+async def get_tutor_memory(user_id: str) -> Optional[Dict[str, Any]]:
+    """The user's running conversation summary and the timestamp and id of the last turn it covers."""
+    async with database.connection() as conn:
+        row = await conn.fetchrow(
+            "SELECT summary, summarized_ts, summarized_id FROM tutor_memory WHERE user_id = $1", user_id
+        )
+    return dict(row) if row else None
+
+async def save_tutor_memory(user_id: str, summary: str, summarized_ts: datetime, summarized_id: int) -> bool:
+    """
+    Stores a refreshed summary. The update only applies if it covers newer turns than the
+    stored one, so a slower concurrent refresh cannot move the summary backwards.
+    """
+    async with database.connection() as conn:
+        status = await conn.execute(
+            """
+            INSERT INTO tutor_memory (user_id, summary, summarized_ts, summarized_id, updated_at)
+            VALUES ($1, $2, $3, $4, CURRENT_TIMESTAMP)
+            ON CONFLICT (user_id) DO UPDATE SET
+                summary = EXCLUDED.summary,
+                summarized_ts = EXCLUDED.summarized_ts,
+                summarized_id = EXCLUDED.summarized_id,
+                updated_at = EXCLUDED.updated_at
+            WHERE tutor_memory.summarized_id < EXCLUDED.summarized_id
+            """,
+            user_id, summary, summarized_ts, summarized_id
+        )
+    return _rows_affected(status) > 0
+
+# ------------ File-based Doubt ------------
+async def save_file_doubt(user_id: str, filename: str, question: str, answer: str, timestamp: Optional[datetime] = None):
+    """`timestamp` defaults to the insert time; the write-behind buffer passes the enqueue time."""
+    async with database.connection() as conn:
+        await conn.execute(
+            "INSERT INTO file_doubts (user_id, filename, question, answer, timestamp) "
+            "VALUES ($1, $2, $3, $4, COALESCE($5::timestamptz, CURRENT_TIMESTAMP))",
+            user_id, filename, question, answer, timestamp
+        )
+
+# ------------ Batched log writes ------------
+async def save_log_batch(chat_rows: List[tuple], doubt_rows: List[tuple]):
+    """
+    Multi-row INSERTs for the write-behind buffer, committed as one transaction. Each table
+    gets a single statement that unnests column arrays, so the batch size does not change the SQL.
+    chat_rows: (user_id, question, answer, timestamp) tuples.
+    doubt_rows: (user_id, filename, question, answer, timestamp) tuples.
+    """
+    async with database.transaction() as conn:
+        if chat_rows:
+            await conn.execute(
+                "INSERT INTO chat_history (user_id, question, answer, timestamp) "
+                "SELECT * FROM unnest($1::varchar[], $2::text[], $3::text[], $4::timestamptz[])",
+                *(list(column) for column in zip(*chat_rows))
+            )
+        if doubt_rows:
+            await conn.execute(
+                "INSERT INTO file_doubts (user_id, filename, question, answer, timestamp) "
+                "SELECT * FROM unnest($1::varchar[], $2::varchar[], $3::text[], $4::text[], $5::timestamptz[])",
+                *(list(column) for column in zip(*doubt_rows))
+            )
+
+# ------------ Quiz Answers and Progress ------------
+# The rollup upsert always runs in the same statement or transaction as the matching
+# user_progress INSERT, so the two never disagree.
+_ROLLUP_UPSERT = """
+    INSERT INTO user_subject_progress (user_id, subject, attempts, score_sum, total_sum, accuracy_sum, last_attempt_at)
+    VALUES ($1, $2, 1, $3, $4, $5, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id, subject) DO UPDATE SET
+        attempts = user_subject_progress.attempts + 1,
+        score_sum = user_subject_progress.score_sum + EXCLUDED.score_sum,
+        total_sum = user_subject_progress.total_sum + EXCLUDED.total_sum,
+        accuracy_sum = user_subject_progress.accuracy_sum + EXCLUDED.accuracy_sum,
+        last_attempt_at = GREATEST(user_subject_progress.last_attempt_at, EXCLUDED.last_attempt_at)
+"""
+
+_PROGRESS_INSERT = "INSERT INTO user_progress (user_id, subject, score, total, accuracy) VALUES ($1, $2, $3, $4, $5)"
+
+# Attempts, progress row and rollup in one statement: one round trip, atomic by construction
+_QUIZ_SUBMISSION = """
+    WITH attempt_rows AS (
+        INSERT INTO quiz_attempts (user_id, subject, question, options, correct_answer, user_answer, is_correct)
+        SELECT $1, $2, a.question, ARRAY(SELECT jsonb_array_elements_text(a.options)), a.correct_answer, a.user_answer, a.is_correct
+        FROM jsonb_to_recordset($3::jsonb) AS a(question text, options jsonb, correct_answer text, user_answer text, is_correct boolean)
+    ), progress_row AS (
+        INSERT INTO user_progress (user_id, subject, score, total, accuracy) VALUES ($1, $2, $4::int, $5::int, $6::numeric)
+    )
+    INSERT INTO user_subject_progress (user_id, subject, attempts, score_sum, total_sum, accuracy_sum, last_attempt_at)
+    VALUES ($1, $2, 1, $4::int, $5::int, $6::numeric, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id, subject) DO UPDATE SET
+        attempts = user_subject_progress.attempts + 1,
+        score_sum = user_subject_progress.score_sum + EXCLUDED.score_sum,
+        total_sum = user_subject_progress.total_sum + EXCLUDED.total_sum,
+        accuracy_sum = user_subject_progress.accuracy_sum + EXCLUDED.accuracy_sum,
+        last_attempt_at = GREATEST(user_subject_progress.last_attempt_at, EXCLUDED.last_attempt_at)
+"""
+
+async def save_quiz_submission(user_id: str, subject: str, attempts: List[tuple], score: int, total: int):
+    """
+    Writes a graded quiz in one statement: every quiz_attempts row, the user_progress row
+    and the progress rollup. `attempts` holds
+    (question, options, correct_answer, user_answer, is_correct) tuples already graded by the caller.
+    """
+    attempt_json = json.dumps([
+        {"question": q, "options": list(options), "correct_answer": correct, "user_answer": given, "is_correct": ok}
+        for q, options, correct, given, ok in attempts
+    ])
+    async with database.connection() as conn:
+        await conn.execute(_QUIZ_SUBMISSION, user_id, subject, attempt_json, score, total, _accuracy(score, total))
+
+async def save_user_progress(user_id: str, subject: str, score: int, total: int):
+    accuracy = _accuracy(score, total)
+    async with database.transaction() as conn:
+        await conn.execute(_PROGRESS_INSERT, user_id, subject, score, total, accuracy)
+        await conn.execute(_ROLLUP_UPSERT, user_id, subject, score, total, accuracy)
+
+async def get_user_progress(user_id: str) -> List[Dict[str, Any]]:
+    async with database.connection() as conn:
+        rows = await conn.fetch(
+            "SELECT user_id, subject, score, total, accuracy, timestamp FROM user_progress WHERE user_id = $1 ORDER BY timestamp ASC",
+            user_id
+        )
+    return [dict(row) for row in rows]
+
+async def get_user_progress_summary(user_id: str) -> List[Dict[str, Any]]:
+    """Per-subject totals from the rollup table: one row per subject, however many attempts there are."""
+    async with database.connection() as conn:
+        rows = await conn.fetch(
+            "SELECT subject, attempts, score_sum, total_sum, accuracy_sum, last_attempt_at "
+            "FROM user_subject_progress WHERE user_id = $1 ORDER BY subject",
+            user_id
+        )
+    summary = []
+    for row in rows:
+        attempts, score_sum, total_sum = row["attempts"], row["score_sum"], row["total_sum"]
+        summary.append({
+            "subject": row["subject"],
+            "attempts": attempts,
+            "score": score_sum,
+            "total": total_sum,
+            "avg_accuracy": round(float(row["accuracy_sum"]) / attempts, 2) if attempts else 0,
+            "overall_accuracy": round(score_sum / total_sum * 100, 2) if total_sum else 0,
+            "last_attempt_at": row["last_attempt_at"]
+        })
+    return summary
+
+async def rebuild_progress_rollups(user_id: str = None) -> int:
+    """
+    Recomputes user_subject_progress from user_progress (for one user, or everyone) and
+    returns the number of rollup rows written. user_progress is locked against writes for
+    the duration, so attempts recorded concurrently are neither lost nor double counted.
+    """
+    user_filter = "WHERE user_id = $1" if user_id else ""
+    params = (user_id,) if user_id else ()
+    async with database.transaction() as conn:
+        await conn.execute("LOCK TABLE user_progress IN SHARE MODE")
+        await conn.execute(f"DELETE FROM user_subject_progress {user_filter}", *params)
+        status = await conn.execute(
+            "INSERT INTO user_subject_progress "
+            "(user_id, subject, attempts, score_sum, total_sum, accuracy_sum, last_attempt_at) "
+            "SELECT user_id, subject, COUNT(*), SUM(score), SUM(total), SUM(accuracy), "
+            "COALESCE(MAX(timestamp), CURRENT_TIMESTAMP) "
+            f"FROM user_progress {user_filter} GROUP BY user_id, subject",
+            *params
+        )
+    return _rows_affected(status)
+
+# ------------ LLM Response Cache (shared tier) ------------
+async def get_cached_llm_response(cache_key: str, max_age_seconds: float) -> Optional[str]:
+    async with database.connection() as conn:
+        return await conn.fetchval(
+            "SELECT response FROM llm_response_cache WHERE cache_key = $1 AND created_at > NOW() - make_interval(secs => $2)",
+            cache_key, float(max_age_seconds)
+        )
+
+async def save_cached_llm_response(cache_key: str, model_name: str, response: str):
+    async with database.connection() as conn:
+        await conn.execute(
+            "INSERT INTO llm_response_cache (cache_key, model_name, response) VALUES ($1, $2, $3) "
+            "ON CONFLICT (cache_key) DO UPDATE SET response = EXCLUDED.response, created_at = CURRENT_TIMESTAMP",
+            cache_key, model_name, response
+        )
+
+async def delete_cached_llm_response(cache_key: str):
+    async with database.connection() as conn:
+        await conn.execute("DELETE FROM llm_response_cache WHERE cache_key = $1", cache_key)
+
+# ------------ Quiz Question Bank ------------
+async def save_quiz_questions(subject: str, questions: List[Dict[str, Any]]) -> int:
+    """Stores already-validated questions in the bank, skipping ones it already holds. Returns rows added."""
+    if not questions:
+        return 0
+    async with database.connection() as conn:
+        status = await conn.execute(
+            "INSERT INTO quiz_questions (subject, question, options, answer, question_hash) "
+            "SELECT $1, q.question, ARRAY(SELECT jsonb_array_elements_text(q.options)), q.answer, q.question_hash "
+            "FROM jsonb_to_recordset($2::jsonb) AS q(question text, options jsonb, answer text, question_hash text) "
+            "ON CONFLICT (subject, question_hash) DO NOTHING",
+            subject,
+            json.dumps([
+                {"question": q["question"], "options": q["options"], "answer": q["answer"], "question_hash": q["question_hash"]}
+                for q in questions
+            ])
+        )
+    return _rows_affected(status)
+
+async def sample_quiz_questions(subject: str, num_questions: int, user_id: str = None) -> List[Dict[str, Any]]:
+    """
+    Random sample of distinct bank questions for a subject. Questions the user has
+    already answered are only used once the unseen ones run out.
+    """
+    async with database.connection() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT q.question, q.options, q.answer
+            FROM quiz_questions q
+            WHERE q.subject = $1
+            ORDER BY EXISTS (
+                SELECT 1 FROM quiz_attempts a WHERE a.user_id = $2 AND a.question = q.question
+            ), random()
+            LIMIT $3
+            """,
+            subject, user_id, num_questions
+        )
+    return [{"question": row["question"], "options": list(row["options"]), "answer": row["answer"]} for row in rows]
+
+async def count_quiz_questions_by_subject() -> Dict[str, int]:
+    async with database.connection() as conn:
+        rows = await conn.fetch("SELECT subject, COUNT(*) AS questions FROM quiz_questions GROUP BY subject")
+    return {row["subject"]: row["questions"] for row in rows}
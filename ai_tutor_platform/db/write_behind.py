@@ -0,0 +1,152 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from ai_tutor_platform.config.configuration import config_instance
+from ai_tutor_platform.db.repository import save_log_batch, save_chat, save_file_doubt
+
+_CHAT = "chat"
+_DOUBT = "doubt"
+
+
+class WriteBehindBuffer:
+    """
+    In-process write-behind buffer for chat_history and file_doubts rows. Requests enqueue
+    a row and return; a background task flushes the rows in multi-row INSERTs whenever
+    `max_batch_rows` are waiting or `flush_interval_seconds` has passed, and drains what is
+    left on stop(). The queue is bounded: when it is full, callers wait briefly for room
+    and then fall back to writing their row directly, so memory never grows without limit.
+    """
+    def __init__(self):
+        self.max_batch_rows = max(1, config_instance.get_write_behind_max_batch_rows())
+        self.flush_interval = config_instance.get_write_behind_flush_interval_seconds()
+        self.put_timeout = config_instance.get_write_behind_put_timeout_seconds()
+        self.max_flush_attempts = max(1, config_instance.get_write_behind_max_flush_attempts())
+        self.max_queue_rows = config_instance.get_write_behind_max_queue_rows()
+        self._queue = None
+        self._task = None
+        self.stats = {"enqueued": 0, "flushed": 0, "batches": 0, "direct_writes": 0, "dropped": 0}
+
+    def start(self):
+        """Starts the flusher on the running event loop (idempotent)."""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_rows)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Flushes everything still buffered, then stops the flusher task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._queue is not None:
+            await self._flush(self._take_all())
+
+    # --- Producer side ---
+    async def enqueue_chat(self, user_id: str, question: str, answer: str):
+        await self._enqueue((_CHAT, (user_id, question, answer, datetime.now(timezone.utc))))
+
+    async def enqueue_file_doubt(self, user_id: str, filename: str, question: str, answer: str):
+        await self._enqueue((_DOUBT, (user_id, filename, question, answer, datetime.now(timezone.utc))))
+
+    async def _enqueue(self, item: tuple):
+        self.start()
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Backpressure: wait for the flusher to make room, then give up and write directly
+            try:
+                await asyncio.wait_for(self._queue.put(item), timeout=self.put_timeout)
+            except asyncio.TimeoutError:
+                self.stats["direct_writes"] += 1
+                await self._write_direct(item)
+                return
+        self.stats["enqueued"] += 1
+
+    @staticmethod
+    async def _write_direct(item: tuple):
+        # Rows keep the timestamp taken at enqueue time, as they would in a batch
+        kind, row = item
+        if kind == _CHAT:
+            await save_chat(*row)
+        else:
+            await save_file_doubt(*row)
+
+    # --- Flusher task ---
+    def _take_all(self) -> list:
+        items = []
+        while not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        return items
+
+    async def _run(self):
+        batch = []
+        flushing = None
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                # Keep collecting until the batch is full or the first row has waited a full interval
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.max_batch_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+                # Hand the rows over before awaiting: a cancellation mid-flush then lets that
+                # flush finish instead of writing the same rows a second time
+                pending, batch = batch, []
+                flushing = asyncio.ensure_future(self._flush(pending))
+                await asyncio.shield(flushing)
+                flushing = None
+        except asyncio.CancelledError:
+            # Finish the flush in progress and write the rows collected so far; stop()
+            # then drains whatever is still in the queue
+            if flushing is not None:
+                await asyncio.shield(flushing)
+            await asyncio.shield(self._flush(batch))
+            raise
+
+    async def _flush(self, items: list):
+        for start in range(0, len(items), self.max_batch_rows):
+            batch = items[start:start + self.max_batch_rows]
+            chat_rows = [row for kind, row in batch if kind == _CHAT]
+            doubt_rows = [row for kind, row in batch if kind == _DOUBT]
+            for attempt in range(1, self.max_flush_attempts + 1):
+                try:
+                    await save_log_batch(chat_rows, doubt_rows)
+                    self.stats["flushed"] += len(batch)
+                    self.stats["batches"] += 1
+                    break
+                except Exception as e:
+                    print(f"Write-behind flush of {len(batch)} rows failed (attempt {attempt}): {e}")
+                    if attempt < self.max_flush_attempts:
+                        await asyncio.sleep(min(0.5 * 2 ** (attempt - 1), 5.0))
+            else:
+                self.stats["dropped"] += len(batch)
+                print(f"Write-behind: dropped {len(batch)} rows after {self.max_flush_attempts} failed attempts.")
+
+
+write_behind = WriteBehindBuffer()
+
+
+async def record_chat(user_id: str, question: str, answer: str):
+    """Logs a tutor exchange without making the response wait on a commit."""
+    if config_instance.get_write_behind_enabled():
+        await write_behind.enqueue_chat(user_id, question, answer)
+    else:
+        await save_chat(user_id, question, answer)
+
+
+async def record_file_doubt(user_id: str, filename: str, question: str, answer: str):
+    """Logs a solved doubt without making the response wait on a commit."""
+    if config_instance.get_write_behind_enabled():
+        await write_behind.enqueue_file_doubt(user_id, filename, question, answer)
+    else:
+        await save_file_doubt(user_id, filename, question, answer)
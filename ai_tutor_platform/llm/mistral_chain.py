@@ -1,51 +1,360 @@
 import os
-from langchain_groq import ChatGroq # Correct import for Groq
-from langchain.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough # For chaining in newer LangChain versions if needed, or stick to LLMChain
-# If you are using LangChain 0.2.x+ and prefer the new LCEL syntax directly
-# from langchain_core.output_parsers import StrOutputParser
+import asyncio
+import threading
+import time
+from typing import Optional
+# LangChain and the Groq client are imported when the chain is first built (see _build_chain),
+# so importing this module stays cheap for processes that never call the LLM.
 
 from ai_tutor_platform.config.configuration import config_instance # Import the config instance
+from ai_tutor_platform.llm.response_cache import response_cache, make_cache_key
+from ai_tutor_platform.llm.singleflight import llm_single_flight
+from ai_tutor_platform.llm.scheduler import llm_scheduler, Priority, LLMOverloadedError, rate_limit_retry_after
+from ai_tutor_platform.llm.resilience import ModelRouter, LLMUnavailableError, is_retryable
+from ai_tutor_platform.llm.token_budget import estimate_tokens
+from ai_tutor_platform.monitoring.metrics import observe_llm_call, LLM_RETRIES, LLM_HEDGES
+
+SYSTEM_PROMPT = "You are an AI tutor designed to help students learn and solve problems."
+
+
+def groq_base_url(api_base: str) -> str:
+    """The Groq client appends /openai/v1 itself, so it takes the host part of the OpenAI-compatible base URL."""
+    api_base = api_base.rstrip("/")
+    return api_base[:-len("/openai/v1")] if api_base.endswith("/openai/v1") else api_base
 
 class LLMChainWrapper:
     def __init__(self):
-        # Load API key and model name from the centralized config
+        # Only cheap settings are read here; the clients themselves are built on first use
+        self.model_name = config_instance.get_groq_model_name() # <-- Call the method
+        self.fallback_model_name = config_instance.get_groq_fallback_model_name()
+        self.temperature = config_instance.get_temperature() # Get temperature from config
+        self._chains = {}
+        self._chain_lock = threading.Lock()
+
+        # Rate limits, the concurrency cap and fair queuing are handled by llm_scheduler
+        self.coalesce_enabled = config_instance.get_llm_coalesce_enabled()
+        # Timeouts, retries, hedging and failover between the primary and fallback models
+        self.router = ModelRouter(self.model_name, self.fallback_model_name)
+
+    @property
+    def chain(self):
+        """The prompt | ChatGroq chain for the primary model, built once on first use (thread-safe)."""
+        return self.chain_for(self.model_name)
+
+    def chain_for(self, model_name: str, json_mode: bool = False):
+        key = (model_name, json_mode)
+        chain = self._chains.get(key)
+        if chain is None:
+            with self._chain_lock:
+                chain = self._chains.get(key)
+                if chain is None:
+                    chain = self._chains[key] = self._build_chain(model_name, json_mode)
+        return chain
+
+    def _build_chain(self, model_name: str, json_mode: bool = False):
+        from langchain_groq import ChatGroq # Correct import for Groq
+        from langchain.prompts import ChatPromptTemplate
+
+        # Load API key from the centralized config
         groq_api_key = config_instance.get_groq_api_key() # <-- Call the method
-        groq_model_name = config_instance.get_groq_model_name() # <-- Call the method
-        temperature = config_instance.get_temperature() # Get temperature from config
 
         # Ensure API key is available
         if not groq_api_key: # Check for empty string or None
             raise ValueError("Groq API key is not set. Please set the GROQ_API_KEY environment variable.")
 
         # Initialize ChatGroq with the API key and chosen model
-        self.llm = ChatGroq(
-            temperature=temperature, # Use configured temperature
+        llm = ChatGroq(
+            temperature=self.temperature, # Use configured temperature
             groq_api_key=groq_api_key,
-            model_name=groq_model_name
+            base_url=groq_base_url(config_instance.get_api_base()),
+            model_name=model_name,
+            timeout=self.router.timeout,
+            max_retries=0 # Retries, backoff and failover are handled here, not inside the client
         )
-        
+        if json_mode:
+            # JSON mode: the API only returns a syntactically valid JSON object
+            llm = llm.bind(response_format={"type": "json_object"})
+
         # Define a flexible prompt template
-        self.prompt_template = ChatPromptTemplate.from_messages([
-            ("system", "You are an AI tutor designed to help students learn and solve problems."),
+        prompt_template = ChatPromptTemplate.from_messages([
+            ("system", SYSTEM_PROMPT),
             ("user", "{question}")
         ])
-        
+
         # Combine the prompt and LLM into a chain
         # Using LCEL (LangChain Expression Language) for robust chaining
-        self.chain = self.prompt_template | self.llm # | StrOutputParser() if you want to explicitly parse to string
+        return prompt_template | llm
+
+    @staticmethod
+    def _call_cost(prompt: str) -> int:
+        """Estimated tokens a call uses, charged against the scheduler's tokens-per-minute bucket."""
+        return estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(prompt) + llm_scheduler.completion_token_estimate
 
-    def generate_response(self, prompt: str) -> str:
+    def _next_retry(self, error: Exception, attempts: dict) -> Optional[float]:
         """
-        Generates a raw string response from the LLM without formatting (no markdown or code blocks).
+        Seconds to wait before retrying after `error`, or None to give up. A 429 pauses the
+        scheduler (which then holds the retry); timeouts, connection errors and 5xx get
+        jittered exponential backoff. Other errors are not retried.
         """
-        try:
-            response = self.chain.invoke({"question": prompt})
+        backoff = rate_limit_retry_after(error, llm_scheduler.rate_limit_backoff)
+        if backoff is not None:
+            if attempts["rate_limited"] >= llm_scheduler.max_rate_limit_retries:
+                return None
+            attempts["rate_limited"] += 1
+            LLM_RETRIES.labels("rate_limited").inc()
+            return llm_scheduler.on_rate_limited(backoff)
+        if not is_retryable(error) or attempts["errors"] >= self.router.max_retries:
+            return None
+        delay = self.router.retry_delay(attempts["errors"])
+        attempts["errors"] += 1
+        self.router.count("retries")
+        LLM_RETRIES.labels("error").inc()
+        return delay
+
+    def cache_key(self, prompt: str, json_mode: bool = False) -> str:
+        # JSON-mode completions are cached apart from free-form ones for the same prompt
+        model = f"{self.model_name}:json" if json_mode else self.model_name
+        return make_cache_key(model, self.temperature, SYSTEM_PROMPT, prompt)
+
+    def invalidate_cached_response(self, prompt: str, json_mode: bool = False):
+        """Drops a cached completion, e.g. one that turned out to be unusable."""
+        response_cache.invalidate(self.cache_key(prompt, json_mode))
+
+    async def ainvalidate_cached_response(self, prompt: str, json_mode: bool = False):
+        """Async counterpart of invalidate_cached_response for callers on the event loop."""
+        await response_cache.ainvalidate(self.cache_key(prompt, json_mode))
+
+    def _should_coalesce(self, use_cache: bool, coalesce: Optional[bool]) -> bool:
+        # By default only cacheable calls coalesce: a caller that skips the cache wants its own completion
+        if not self.coalesce_enabled:
+            return False
+        return use_cache if coalesce is None else coalesce
+
+    # --- Upstream calls ---
+    def _invoke(self, prompt: str, json_mode: bool = False) -> str:
+        """One completion on the sync path: rate limits, timeout, retries and failover (no hedging)."""
+        attempts = {"errors": 0, "rate_limited": 0}
+        while True:
+            model = self.router.available_models()[0]
+            llm_scheduler.acquire_blocking(self._call_cost(prompt))
+            start = time.monotonic()
+            try:
+                response = self.chain_for(model, json_mode).invoke({"question": prompt})
+            except Exception as e:
+                observe_llm_call(model, time.monotonic() - start, prompt, error=e)
+                self.router.record_failure(model, e)
+                delay = self._next_retry(e, attempts)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            elapsed = time.monotonic() - start
+            self.router.record_success(model, elapsed)
+            observe_llm_call(model, elapsed, prompt, response)
             # LangChain 0.2.x+ returns AIMessage objects, access content via .content
             return response.content.strip()
-        except Exception as e:
-            return f"[ERROR] {str(e)}"
+
+    async def _ainvoke_model(self, model: str, prompt: str, user_id: Optional[str], priority: Priority,
+                             json_mode: bool = False) -> str:
+        async with llm_scheduler.slot(user_id, priority, self._call_cost(prompt)):
+            start = time.monotonic()
+            try:
+                response = await asyncio.wait_for(self.chain_for(model, json_mode).ainvoke({"question": prompt}), self.router.timeout)
+            except asyncio.TimeoutError:
+                error = TimeoutError(f"{model} did not answer within {self.router.timeout:g}s")
+                observe_llm_call(model, time.monotonic() - start, prompt, error=error)
+                self.router.record_failure(model, error)
+                raise error from None
+            except asyncio.CancelledError:
+                raise # Lost a hedge race or the caller went away; says nothing about the model
+            except Exception as e:
+                observe_llm_call(model, time.monotonic() - start, prompt, error=e)
+                self.router.record_failure(model, e)
+                raise
+        elapsed = time.monotonic() - start
+        self.router.record_success(model, elapsed)
+        observe_llm_call(model, elapsed, prompt, response)
+        return response.content.strip()
+
+    async def _ainvoke_hedged(self, prompt: str, user_id: Optional[str], priority: Priority, json_mode: bool = False) -> str:
+        """
+        Sends the call to the first healthy model. With hedging on, if it has not answered
+        within that model's recent p95 latency, a backup request goes to the next model;
+        the first successful answer wins and the other request is cancelled.
+        """
+        models = self.router.available_models()
+        primary = asyncio.ensure_future(self._ainvoke_model(models[0], prompt, user_id, priority, json_mode))
+        if not self.router.hedging_enabled or len(models) < 2:
+            return await primary
+
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.router.hedge_delay(models[0]))
+            # A slow answer while calls are queueing is the scheduler's doing; a hedge would only add load
+            if not done and llm_scheduler.queue_depth == 0:
+                self.router.count("hedges_fired")
+                LLM_HEDGES.labels("fired").inc()
+                tasks.add(asyncio.ensure_future(self._ainvoke_model(models[1], prompt, user_id, priority, json_mode)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.router.count("hedges_won")
+                            LLM_HEDGES.labels("won").inc()
+                        return task.result()
+                    if error is None or isinstance(error, LLMOverloadedError):
+                        error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _ainvoke(self, prompt: str, user_id: Optional[str], priority: Priority, json_mode: bool = False) -> str:
+        attempts = {"errors": 0, "rate_limited": 0}
+        while True:
+            try:
+                return await self._ainvoke_hedged(prompt, user_id, priority, json_mode)
+            except (LLMOverloadedError, LLMUnavailableError):
+                raise
+            except Exception as e:
+                delay = self._next_retry(e, attempts)
+                if delay is None:
+                    raise
+                if delay:
+                    await asyncio.sleep(delay)
+
+    async def _astream_model(self, model: str, prompt: str, json_mode: bool = False):
+        """chain.astream with the request timeout applied to every wait for the next chunk."""
+        stream = self.chain_for(model, json_mode).astream({"question": prompt}).__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), self.router.timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"{model} stopped streaming for {self.router.timeout:g}s") from None
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    # --- Public API ---
+    def generate_response(self, prompt: str, use_cache: bool = True, coalesce: Optional[bool] = None,
+                          json_mode: bool = False) -> str:
+        """
+        Generates a raw string response from the LLM without formatting (no markdown or code blocks).
+        Identical prompts are served from the response cache unless `use_cache` is False, and
+        identical prompts already in flight share that call's result when `coalesce` is on
+        (by default it follows `use_cache`). With `json_mode` the model is constrained to answer
+        with a JSON object (the prompt must ask for one). Blocks until the scheduler's rate limits allow the call.
+        """
+        coalesce = self._should_coalesce(use_cache, coalesce)
+        use_cache = use_cache and response_cache.enabled
+        key = self.cache_key(prompt, json_mode)
+        if use_cache:
+            cached = response_cache.get(key)
+            if cached is not None:
+                return cached
+
+        def call() -> str:
+            try:
+                text = self._invoke(prompt, json_mode)
+            except Exception as e:
+                return f"[ERROR] {str(e)}"
+            if use_cache and text:
+                response_cache.set(key, self.model_name, text)
+            return text
+
+        return llm_single_flight.do(key, call) if coalesce else call()
+
+    async def agenerate_response(self, prompt: str, use_cache: bool = True, coalesce: Optional[bool] = None,
+                                 user_id: Optional[str] = None, priority: Priority = Priority.INTERACTIVE,
+                                 json_mode: bool = False) -> str:
+        """
+        Async counterpart of generate_response. Awaits the upstream call instead of
+        holding a worker thread. The call is admitted by llm_scheduler under `priority`,
+        queued fairly against other users' calls, and may be hedged to the fallback model
+        (see _ainvoke_hedged). Timeouts and 5xx are retried with jittered backoff; a 429
+        pauses the scheduler and re-queues the call. Raises LLMOverloadedError when the
+        queue is full. `json_mode` is as for generate_response.
+        """
+        coalesce = self._should_coalesce(use_cache, coalesce)
+        use_cache = use_cache and response_cache.enabled
+        key = self.cache_key(prompt, json_mode)
+        if use_cache:
+            cached = await response_cache.aget(key)
+            if cached is not None:
+                return cached
+
+        async def call() -> str:
+            try:
+                text = await self._ainvoke(prompt, user_id, priority, json_mode)
+            except LLMOverloadedError:
+                raise
+            except Exception as e:
+                return f"[ERROR] {str(e)}"
+            if use_cache and text:
+                response_cache.set_nowait(key, self.model_name, text)
+            return text
+
+        return await llm_single_flight.ado(key, call) if coalesce else await call()
+
+    async def astream_response(self, prompt: str, use_cache: bool = True, user_id: Optional[str] = None,
+                               priority: Priority = Priority.INTERACTIVE, json_mode: bool = False):
+        """
+        Yields the LLM response as text chunks while they are generated (driven by chain.astream).
+        A cached answer is yielded as a single chunk. Streams are never coalesced or hedged,
+        but a call that fails before its first chunk is retried, on the fallback model if the
+        primary's breaker is open. Errors are raised to the caller, which is already
+        mid-stream and decides how to report them. `json_mode` is as for generate_response
+        (only for providers that stream JSON mode) and selects the matching cache key.
+        """
+        use_cache = use_cache and response_cache.enabled
+        if use_cache:
+            key = self.cache_key(prompt, json_mode)
+            cached = await response_cache.aget(key)
+            if cached is not None:
+                yield cached
+                return
+
+        parts = []
+        attempts = {"errors": 0, "rate_limited": 0}
+        while True:
+            model = self.router.available_models()[0]
+            start = None
+            try:
+                async with llm_scheduler.slot(user_id, priority, self._call_cost(prompt)):
+                    start = time.monotonic()
+                    async for chunk in self._astream_model(model, prompt, json_mode):
+                        if chunk.content:
+                            parts.append(chunk.content)
+                            yield chunk.content
+                self.router.record_success(model)
+                observe_llm_call(model, time.monotonic() - start, prompt, completion="".join(parts))
+                break
+            except LLMOverloadedError:
+                raise
+            except Exception as e:
+                if start is not None:
+                    observe_llm_call(model, time.monotonic() - start, prompt, error=e)
+                self.router.record_failure(model, e)
+                # Only retry before anything has been sent to the client
+                delay = None if parts else self._next_retry(e, attempts)
+                if delay is None:
+                    raise
+                if delay:
+                    await asyncio.sleep(delay)
+
+        text = "".join(parts).strip()
+        if use_cache and text:
+            response_cache.set_nowait(key, self.model_name, text)
 
 # Make an instance globally available if other modules import generate_response directly
 llm_wrapper_instance = LLMChainWrapper()
 generate_response = llm_wrapper_instance.generate_response
+agenerate_response = llm_wrapper_instance.agenerate_response
+astream_response = llm_wrapper_instance.astream_response
+invalidate_cached_response = llm_wrapper_instance.invalidate_cached_response
+ainvalidate_cached_response = llm_wrapper_instance.ainvalidate_cached_response
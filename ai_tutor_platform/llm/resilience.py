@@ -0,0 +1,163 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+from ai_tutor_platform.config.configuration import config_instance
+from ai_tutor_platform.llm.scheduler import error_status_code
+
+# Error classes from the Groq/OpenAI/httpx clients that are worth retrying on another attempt
+_RETRYABLE_ERROR_NAMES = {
+    "APITimeoutError", "APIConnectionError", "InternalServerError", "ServiceUnavailableError",
+    "Timeout", "TimeoutException", "ReadTimeout", "ConnectTimeout", "ConnectError", "RemoteProtocolError"
+}
+
+
+class LLMUnavailableError(Exception):
+    """Every configured model has its circuit breaker open."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection failures and 5xx responses; client errors such as 400/401 are not."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = error_status_code(error)
+    if status is not None:
+        return status >= 500 or status == 408
+    return type(error).__name__ in _RETRYABLE_ERROR_NAMES
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_seconds`; after that calls are let through again (half-open), the next
+    success closes it and the next failure re-opens it for another `reset_seconds`.
+    """
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+        self.opened_count = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            return self._opened_at is None or time.monotonic() - self._opened_at >= self.reset_seconds
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    self.opened_count += 1
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, used to time hedged requests."""
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+class ModelRouter:
+    """
+    Per-model health for LLMChainWrapper: a circuit breaker and a latency window for the
+    primary model and the optional fallback. Decides which model a call goes to, whether
+    a hedge may be fired, and how long to wait before firing it.
+    """
+    def __init__(self, primary: str, fallback: Optional[str]):
+        self.primary = primary
+        self.fallback = fallback if fallback and fallback != primary else None
+        self.models = [m for m in (self.primary, self.fallback) if m]
+        threshold = config_instance.get_llm_breaker_failure_threshold()
+        reset_seconds = config_instance.get_llm_breaker_reset_seconds()
+        self.breakers = {model: CircuitBreaker(threshold, reset_seconds) for model in self.models}
+        self.latencies = {model: LatencyTracker() for model in self.models}
+        self.timeout = config_instance.get_llm_request_timeout_seconds() or None # 0 = no timeout
+        self.max_retries = config_instance.get_llm_max_retries()
+        self.retry_base_delay = config_instance.get_llm_retry_base_delay_seconds()
+        self.retry_max_delay = config_instance.get_llm_retry_max_delay_seconds()
+        self.hedging_enabled = config_instance.get_llm_hedging_enabled() and self.fallback is not None
+        self.hedge_percentile = config_instance.get_llm_hedge_latency_percentile()
+        self.hedge_min_samples = config_instance.get_llm_hedge_min_samples()
+        self.hedge_default_delay = config_instance.get_llm_hedge_default_delay_seconds()
+        self.hedge_min_delay = config_instance.get_llm_hedge_min_delay_seconds()
+        self._stats_lock = threading.Lock()
+        self._stats = {"retries": 0, "timeouts": 0, "failovers": 0, "hedges_fired": 0, "hedges_won": 0}
+
+    def count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def available_models(self) -> List[str]:
+        """Models whose breaker lets a call through right now, primary first."""
+        models = [model for model in self.models if self.breakers[model].allow()]
+        if not models:
+            raise LLMUnavailableError("All LLM models are failing; try again shortly.")
+        if models[0] != self.primary:
+            self.count("failovers")
+        return models
+
+    def hedge_delay(self, model: str) -> float:
+        """The model's recent p95 latency (or a default until there are enough samples)."""
+        observed = self.latencies[model].percentile(self.hedge_percentile, self.hedge_min_samples)
+        return max(self.hedge_min_delay, observed if observed is not None else self.hedge_default_delay)
+
+    def retry_delay(self, attempt: int) -> float:
+        return backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
+
+    def record_success(self, model: str, seconds: Optional[float] = None):
+        self.breakers[model].record_success()
+        if seconds is not None: # Streams are not comparable with single completions
+            self.latencies[model].record(seconds)
+
+    def record_failure(self, model: str, error: Exception):
+        if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+            self.count("timeouts")
+        if is_retryable(error): # A bad request says nothing about the model's health
+            self.breakers[model].record_failure()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["models"] = {
+            model: {
+                "breaker": self.breakers[model].state,
+                "breaker_opened": self.breakers[model].opened_count,
+                "p95_seconds": self.latencies[model].percentile(95, 1)
+            }
+            for model in self.models
+        }
+        return stats
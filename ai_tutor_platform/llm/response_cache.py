@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from ai_tutor_platform.config.configuration import config_instance
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Canonical form of a prompt for cache lookups: case-folded, whitespace collapsed
+    and trailing punctuation dropped, so "What is photosynthesis?" and
+    "what is  photosynthesis" share one entry.
+    """
+    return _WHITESPACE_RE.sub(" ", prompt.casefold()).strip().rstrip("?!. ")
+
+
+def make_cache_key(model_name: str, temperature: float, system_prompt: str, prompt: str) -> str:
+    raw = "\x1f".join([model_name, repr(float(temperature)), system_prompt, normalize_prompt(prompt)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUTTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries also expire after `ttl_seconds`.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class ResponseCache:
+    """
+    Two-tier cache for LLM completions: a per-process LRU in front of a shared
+    Postgres table, so identical prompts from different workers are answered once.
+    The shared tier is best effort; if the database is unavailable it behaves as a miss.
+    """
+    def __init__(self, enabled: bool, max_entries: int, ttl_seconds: int, shared_backend: str):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.local = LRUTTLCache(max_entries, ttl_seconds)
+        self.shared_backend = shared_backend.strip().lower()
+        self._stats_lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "stores": 0, "shared_errors": 0}
+        self._pending_writes = set()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["local_hits"] + stats["shared_hits"]) / lookups, 4) if lookups else 0.0
+        stats["local_entries"] = len(self.local)
+        return stats
+
+    # --- Shared (Postgres) tier ---
+    def _shared_get(self, key: str) -> Optional[str]:
+        if self.shared_backend != "postgres":
+            return None
+        try:
+            from ai_tutor_platform.db.pg_client import get_cached_llm_response
+            return get_cached_llm_response(key, self.ttl_seconds)
+        except Exception as e:
+            print(f"LLM cache: shared tier lookup failed: {e}")
+            self._count("shared_errors")
+            return None
+
+    def _shared_set(self, key: str, model_name: str, value: str):
+        if self.shared_backend != "postgres":
+            return
+        try:
+            from ai_tutor_platform.db.pg_client import save_cached_llm_response
+            save_cached_llm_response(key, model_name, value)
+        except Exception as e:
+            print(f"LLM cache: shared tier store failed: {e}")
+            self._count("shared_errors")
+
+    def _shared_delete(self, key: str):
+        if self.shared_backend != "postgres":
+            return
+        try:
+            from ai_tutor_platform.db.pg_client import delete_cached_llm_response
+            delete_cached_llm_response(key)
+        except Exception as e:
+            print(f"LLM cache: shared tier delete failed: {e}")
+            self._count("shared_errors")
+
+    async def _ashared_get(self, key: str) -> Optional[str]:
+        if self.shared_backend != "postgres":
+            return None
+        try:
+            from ai_tutor_platform.db.repository import get_cached_llm_response
+            return await get_cached_llm_response(key, self.ttl_seconds)
+        except Exception as e:
+            print(f"LLM cache: shared tier lookup failed: {e}")
+            self._count("shared_errors")
+            return None
+
+    async def _ashared_set(self, key: str, model_name: str, value: str):
+        try:
+            from ai_tutor_platform.db.repository import save_cached_llm_response
+            await save_cached_llm_response(key, model_name, value)
+        except Exception as e:
+            print(f"LLM cache: shared tier store failed: {e}")
+            self._count("shared_errors")
+
+    async def _ashared_delete(self, key: str):
+        if self.shared_backend != "postgres":
+            return
+        try:
+            from ai_tutor_platform.db.repository import delete_cached_llm_response
+            await delete_cached_llm_response(key)
+        except Exception as e:
+            print(f"LLM cache: shared tier delete failed: {e}")
+            self._count("shared_errors")
+
+    # --- Sync API ---
+    def get(self, key: str) -> Optional[str]:
+        value = self.local.get(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        value = self._shared_get(key)
+        if value is not None:
+            self._count("shared_hits")
+            self.local.set(key, value)
+            return value
+        self._count("misses")
+        return None
+
+    def set(self, key: str, model_name: str, value: str):
+        self.local.set(key, value)
+        self._count("stores")
+        self._shared_set(key, model_name, value)
+
+    def invalidate(self, key: str):
+        self.local.delete(key)
+        self._shared_delete(key)
+
+    # --- Async API (shared tier goes through the asyncpg repository) ---
+    async def aget(self, key: str) -> Optional[str]:
+        value = self.local.get(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        value = await self._ashared_get(key)
+        if value is not None:
+            self._count("shared_hits")
+            self.local.set(key, value)
+            return value
+        self._count("misses")
+        return None
+
+    async def ainvalidate(self, key: str):
+        self.local.delete(key)
+        await self._ashared_delete(key)
+
+    def set_nowait(self, key: str, model_name: str, value: str):
+        """Stores locally right away and writes the shared tier in the background."""
+        self.local.set(key, value)
+        self._count("stores")
+        if self.shared_backend == "postgres":
+            task = asyncio.get_running_loop().create_task(self._ashared_set(key, model_name, value))
+            # Keep a reference until the write finishes so the task is not garbage collected
+            self._pending_writes.add(task)
+            task.add_done_callback(self._pending_writes.discard)
+
+
+response_cache = ResponseCache(
+    enabled=config_instance.get_llm_cache_enabled(),
+    max_entries=config_instance.get_llm_cache_max_entries(),
+    ttl_seconds=config_instance.get_llm_cache_ttl_seconds(),
+    shared_backend=config_instance.get_llm_cache_shared_backend()
+)
@@ -0,0 +1,300 @@
+import asyncio
+import enum
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from ai_tutor_platform.config.configuration import config_instance
+from ai_tutor_platform.monitoring.metrics import LLM_QUEUE_WAIT_SECONDS, LLM_REJECTED
+
+
+class Priority(enum.IntEnum):
+    """Scheduling classes; lower values are served first."""
+    INTERACTIVE = 0 # Tutor questions and doubt solving, a student is waiting on the answer
+    QUIZ = 1        # Live quiz generation
+    BATCH = 2       # Background work: question bank refills, memory summaries
+
+
+class LLMOverloadedError(Exception):
+    """Raised instead of queueing when the scheduler's queue is full; the API answers 503."""
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def error_status_code(error: Exception) -> Optional[int]:
+    """HTTP status carried by an upstream client error, if any."""
+    status = getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def rate_limit_retry_after(error: Exception, default: float) -> Optional[float]:
+    """
+    Seconds to back off if `error` is an upstream 429, else None. Uses the Retry-After
+    header when the client exposes the response, falling back to `default`.
+    """
+    if error_status_code(error) != 429 and type(error).__name__ != "RateLimitError" and "429" not in str(error):
+        return None
+    try:
+        return float(getattr(error, "response", None).headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at `per_minute / 60` tokens per second up to
+    `capacity`. A rate of 0 disables the limit.
+    """
+    def __init__(self, per_minute: float, capacity: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, cost: float) -> float:
+        """Seconds until `cost` tokens are available (0 if they are now)."""
+        if not self.rate:
+            return 0.0
+        cost = min(cost, self.capacity) # Oversized requests wait for a full bucket instead of forever
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            return 0.0 if self._tokens >= cost else (cost - self._tokens) / self.rate
+
+    def consume(self, cost: float):
+        if not self.rate:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= min(cost, self.capacity)
+
+    def pause(self, seconds: float):
+        """Empties the bucket and holds it for `seconds`, e.g. after the provider answered 429."""
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = self._paused_until
+
+
+class _Waiter:
+    __slots__ = ("user", "priority", "cost", "future", "enqueued_at")
+
+    def __init__(self, user: str, priority: Priority, cost: int, future: asyncio.Future):
+        self.user = user
+        self.priority = priority
+        self.cost = cost
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class LLMScheduler:
+    """
+    Admission control in front of the upstream LLM. A call may start once the request
+    bucket (requests per minute) and the token bucket (estimated tokens per minute) both
+    have room and fewer than `max_concurrent` calls are in flight. Waiting calls are
+    served by priority class, and round-robin across users within a class, so one user
+    with many queued calls cannot starve the others. When the queue (or one user's share
+    of it) is full, calls fail fast with LLMOverloadedError instead of waiting.
+    """
+    def __init__(self, requests_per_minute: float, request_burst: float, tokens_per_minute: float,
+                 token_burst: float, max_concurrent: int, max_queue_depth: int, max_queued_per_user: int):
+        self.requests = TokenBucket(requests_per_minute, request_burst)
+        self.tokens = TokenBucket(tokens_per_minute, token_burst)
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue_depth = max_queue_depth
+        self.max_queued_per_user = max_queued_per_user
+        self.completion_token_estimate = config_instance.get_llm_scheduler_completion_token_estimate()
+        self.max_rate_limit_retries = config_instance.get_llm_scheduler_max_rate_limit_retries()
+        self.rate_limit_backoff = config_instance.get_llm_scheduler_rate_limit_backoff_seconds()
+        # priority -> OrderedDict(user -> deque of waiters); the first user in each dict is served next
+        self._queues = {priority: OrderedDict() for priority in Priority}
+        self._depth = 0
+        self._queued_by_user = {}
+        self._in_flight = 0
+        self._wakeup = None
+        self._dispatcher = None
+        self._waits = {priority: deque(maxlen=1000) for priority in Priority}
+        self._stats = {priority: {"admitted": 0, "rejected": 0} for priority in Priority}
+        self.rate_limited = 0
+
+    # --- Async API ---
+    @asynccontextmanager
+    async def slot(self, user_id: Optional[str], priority: Priority, cost: int):
+        """Holds one upstream call slot for the duration of the block."""
+        await self.acquire(user_id, priority, cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, user_id: Optional[str], priority: Priority, cost: int):
+        user = user_id or ""
+        if self._depth == 0 and self._in_flight < self.max_concurrent and self._take(cost) == 0:
+            self._admit(priority, 0.0)
+            return
+
+        self.check_admission(user_id, priority)
+        waiter = _Waiter(user, priority, cost, asyncio.get_running_loop().create_future())
+        self._queues[priority].setdefault(user, deque()).append(waiter)
+        self._depth += 1
+        self._queued_by_user[user] = self._queued_by_user.get(user, 0) + 1
+        self._ensure_dispatcher()
+        self._wakeup.set()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release() # Granted just as the caller went away; hand the slot back
+            else:
+                self._dequeue(waiter)
+            raise
+
+    def release(self):
+        self._in_flight -= 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def check_admission(self, user_id: Optional[str], priority: Priority):
+        """Raises LLMOverloadedError if a call from this user would be turned away right now."""
+        user = user_id or ""
+        if self._depth >= self.max_queue_depth or self._queued_by_user.get(user, 0) >= self.max_queued_per_user:
+            self._stats[priority]["rejected"] += 1
+            LLM_REJECTED.labels(priority.name.lower()).inc()
+            raise LLMOverloadedError("The tutor is busy right now. Please try again shortly.", self._retry_after())
+
+    def on_rate_limited(self, seconds: float) -> float:
+        """
+        The provider answered 429: stop issuing calls for `seconds`. Returns how long the
+        caller still has to wait on its own (only when both rate limits are disabled).
+        """
+        self.rate_limited += 1
+        self.requests.pause(seconds)
+        self.tokens.pause(seconds)
+        print(f"LLM scheduler: upstream rate limit hit, pausing for {seconds:.1f}s.")
+        return 0.0 if self.requests.rate or self.tokens.rate else seconds
+
+    @property
+    def queue_depth(self) -> int:
+        return self._depth
+
+    # --- Sync API (callers outside the event loop; rate limits only, no queueing order) ---
+    def acquire_blocking(self, cost: int):
+        while True:
+            delay = self._take(cost)
+            if delay == 0:
+                return
+            time.sleep(delay)
+
+    # --- Internals ---
+    def _take(self, cost: int) -> float:
+        """Consumes one request and `cost` tokens if both are available, else returns how long to wait."""
+        delay = max(self.requests.wait_time(1), self.tokens.wait_time(cost))
+        if delay > 0:
+            return delay
+        self.requests.consume(1)
+        self.tokens.consume(cost)
+        return 0.0
+
+    def _admit(self, priority: Priority, waited: float):
+        self._in_flight += 1
+        self._stats[priority]["admitted"] += 1
+        self._waits[priority].append(waited)
+        LLM_QUEUE_WAIT_SECONDS.labels(priority.name.lower()).observe(waited)
+
+    def _retry_after(self) -> int:
+        rate = self.requests.rate
+        return max(1, math.ceil(self._depth / rate)) if rate else 1
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        for priority in Priority:
+            users = self._queues[priority]
+            if users:
+                return next(iter(users.values()))[0]
+        return None
+
+    def _dequeue(self, waiter: _Waiter):
+        users = self._queues[waiter.priority]
+        queue = users.get(waiter.user)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        if not queue:
+            del users[waiter.user]
+        self._depth -= 1
+        self._queued_by_user[waiter.user] -= 1
+        if not self._queued_by_user[waiter.user]:
+            del self._queued_by_user[waiter.user]
+
+    def _ensure_dispatcher(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            waiter = self._next_waiter()
+            if waiter is None:
+                return # Restarted by the next call that has to queue
+            delay = None
+            if self._in_flight < self.max_concurrent:
+                delay = self._take(waiter.cost)
+                if delay == 0:
+                    self._dequeue(waiter)
+                    # Rotate the user to the back of their class so the next user goes first
+                    users = self._queues[waiter.priority]
+                    if waiter.user in users:
+                        users.move_to_end(waiter.user)
+                    self._admit(waiter.priority, time.monotonic() - waiter.enqueued_at)
+                    waiter.future.set_result(None)
+                    continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        classes = {}
+        for priority in Priority:
+            waits = sorted(self._waits[priority]) or [0.0]
+            classes[priority.name.lower()] = dict(
+                self._stats[priority],
+                wait_ms_p50=round(waits[len(waits) // 2] * 1000, 1),
+                wait_ms_p95=round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1),
+                wait_ms_max=round(waits[-1] * 1000, 1),
+                queued=sum(len(queue) for queue in self._queues[priority].values())
+            )
+        return {"classes": classes, "queue_depth": self._depth, "in_flight": self._in_flight, "rate_limited": self.rate_limited}
+
+
+llm_scheduler = LLMScheduler(
+    requests_per_minute=config_instance.get_llm_scheduler_requests_per_minute(),
+    request_burst=config_instance.get_llm_scheduler_request_burst(),
+    tokens_per_minute=config_instance.get_llm_scheduler_tokens_per_minute(),
+    token_burst=config_instance.get_llm_scheduler_token_burst(),
+    max_concurrent=config_instance.get_max_concurrent_llm_requests(),
+    max_queue_depth=config_instance.get_llm_scheduler_max_queue_depth(),
+    max_queued_per_user=config_instance.get_llm_scheduler_max_queued_per_user()
+)
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from typing import Awaitable, Callable, TypeVar
+
+from ai_tutor_platform.monitoring.metrics import LLM_COALESCED
+
+T = TypeVar("T")
+
+
+class _Call:
+    """An in-flight synchronous call that other threads can wait on."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller (the leader) runs the
+    call and every caller that arrives while it is in flight gets the same result or
+    exception. Nothing is remembered once the call finishes; that is the response cache's job.
+    The async path runs the leader's call as its own task, so a cancelled caller (e.g. a
+    disconnected client) does not cancel the call for the others.
+    """
+    def __init__(self, coalesced_counter=None):
+        self._async_calls = {}
+        self._sync_calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "coalesced": 0}
+        self._coalesced_counter = coalesced_counter # Optional Prometheus counter
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+        if name == "coalesced" and self._coalesced_counter is not None:
+            self._coalesced_counter.inc()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        calls = stats["leaders"] + stats["coalesced"]
+        stats["coalesced_ratio"] = round(stats["coalesced"] / calls, 4) if calls else 0.0
+        stats["in_flight"] = len(self._async_calls) + len(self._sync_calls)
+        return stats
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._async_calls.get(key)
+        if task is None:
+            self._count("leaders")
+            task = asyncio.get_running_loop().create_task(fn())
+            self._async_calls[key] = task
+            task.add_done_callback(lambda _, key=key: self._async_calls.pop(key, None))
+        else:
+            self._count("coalesced")
+        return await asyncio.shield(task)
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._sync_calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._sync_calls[key] = call
+                self._stats["leaders"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        if not leader and self._coalesced_counter is not None:
+            self._coalesced_counter.inc()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._sync_calls.pop(key, None)
+            call.done.set()
+
+
+llm_single_flight = SingleFlight(coalesced_counter=LLM_COALESCED)
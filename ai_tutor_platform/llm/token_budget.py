@@ -0,0 +1,7 @@
+# Rough token accounting used to keep prompts under a budget without loading a tokenizer.
+# English text averages about four characters per token for the Llama/Mixtral tokenizers.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
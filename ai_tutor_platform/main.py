@@ -1,19 +1,9 @@
 import streamlit as st
-import tempfile
 import json
-import pandas as pd
-import altair as alt
 import uuid
 import os
 import requests
 
-from ai_tutor_platform.modules.doubt_solver.file_handler import extract_text_from_file
-
-from ai_tutor_platform.db.pg_client import (
-    get_user_progress,
-    get_chat_history
-)
-
 st.set_page_config(page_title="AI Tutor Platform", layout="wide")
 
 API_BASE_URL = os.getenv("FASTAPI_URL", "http://localhost:8000")
@@ -28,12 +18,16 @@ if "token_type" not in st.session_state:
     st.session_state.token_type = None
 if "chat_history_by_user" not in st.session_state:
     st.session_state.chat_history_by_user = {}
+if "history_cursor_by_user" not in st.session_state:
+    st.session_state.history_cursor_by_user = {} # next_cursor for loading older turns
 if "quiz_questions" not in st.session_state:
     st.session_state.quiz_questions = []
 if "quiz_submitted" not in st.session_state:
     st.session_state.quiz_submitted = False
 if "current_quiz_selections" not in st.session_state:
     st.session_state.current_quiz_selections = {}
+if "uploaded_doc_ids" not in st.session_state:
+    st.session_state.uploaded_doc_ids = {}
 
 
 def get_auth_headers():
@@ -41,6 +35,18 @@ def get_auth_headers():
         return {"Authorization": f"{st.session_state.token_type} {st.session_state.access_token}"}
     return {}
 
+
+def iter_sse_events(response):
+    """Yields (event, data) pairs from a streaming Server-Sent-Events response."""
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            event = None
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[len("data:"):].strip())
+
 if not st.session_state.logged_in:
     st.subheader("Welcome to AI Tutor Platform")
     auth_tab1, auth_tab2 = st.tabs(["Login", "Signup"])
@@ -66,15 +72,17 @@ if not st.session_state.logged_in:
                             st.session_state.token_type = token_data["token_type"]
 
                             try:
+                                # Only the latest page; older turns are fetched on demand
                                 past_chats_response = requests.get(
                                     f"{API_BASE_URL}/tutor/history",
                                     headers=get_auth_headers()
                                 )
                                 if past_chats_response.status_code == 200:
-                                    fetched_history_raw = past_chats_response.json().get('history', [])
+                                    history_page = past_chats_response.json()
                                     st.session_state.chat_history_by_user[username_login] = [
-                                        (item['role'], item['message']) for item in fetched_history_raw
+                                        (item['role'], item['message']) for item in history_page.get('history', [])
                                     ]
+                                    st.session_state.history_cursor_by_user[username_login] = history_page.get('next_cursor')
                                 else:
                                     st.warning(f"Could not load past chat history: {past_chats_response.status_code} - {past_chats_response.json().get('detail', 'Unknown error')}")
                                     st.session_state.chat_history_by_user[username_login] = []
@@ -150,24 +158,40 @@ else:
 
         if st.button("Send", key="send_chat"):
             if user_input.strip():
-                with st.spinner("Thinking..."):
-                    try:
-                        response_api = requests.post(f"{API_BASE_URL}/tutor/ask",
-                                                     headers=get_auth_headers(),
-                                                     json={"question": user_input})
+                stream_placeholder = st.empty()
+                try:
+                    with requests.post(f"{API_BASE_URL}/tutor/ask/stream",
+                                       headers=get_auth_headers(),
+                                       json={"question": user_input},
+                                       stream=True) as response_api:
 
                         if response_api.status_code == 200:
-                            response_data = response_api.json().get("response", "No response from AI.")
-                            if st.session_state.username not in st.session_state.chat_history_by_user:
-                                st.session_state.chat_history_by_user[st.session_state.username] = []
-                            st.session_state.chat_history_by_user[st.session_state.username].append(("user", user_input))
-                            st.session_state.chat_history_by_user[st.session_state.username].append(("ai", response_data))
+                            response_data = ""
+                            stream_error = None
+                            for event, payload in iter_sse_events(response_api):
+                                if event == "error":
+                                    stream_error = payload.get("detail", "Unknown error")
+                                    break
+                                elif event == "done":
+                                    response_data = payload.get("response", response_data)
+                                else:
+                                    response_data += payload.get("token", "")
+                                    stream_placeholder.markdown(f"**🤖 AI:** {response_data}▌")
+                            stream_placeholder.empty()
+
+                            if stream_error:
+                                st.error(f"Error from AI Tutor: {stream_error}")
+                            else:
+                                if st.session_state.username not in st.session_state.chat_history_by_user:
+                                    st.session_state.chat_history_by_user[st.session_state.username] = []
+                                st.session_state.chat_history_by_user[st.session_state.username].append(("user", user_input))
+                                st.session_state.chat_history_by_user[st.session_state.username].append(("ai", response_data or "No response from AI."))
                         else:
                             st.error(f"Error from AI Tutor: {response_api.status_code} - {response_api.json().get('detail', 'Unknown error')}")
-                    except requests.exceptions.ConnectionError:
-                        st.error("Could not connect to the API. Make sure the backend is running.")
-                    except Exception as e:
-                        st.error(f"An error occurred: {e}")
+                except requests.exceptions.ConnectionError:
+                    st.error("Could not connect to the API. Make sure the backend is running.")
+                except Exception as e:
+                    st.error(f"An error occurred: {e}")
             else:
                 st.warning("Please enter a question.")
 
@@ -180,9 +204,29 @@ else:
                 else:
                     st.markdown(f"**🤖 AI:** {msg}")
 
+        older_cursor = st.session_state.history_cursor_by_user.get(st.session_state.username)
+        if older_cursor and st.button("Load older messages", key="load_older_history"):
+            try:
+                older_response = requests.get(
+                    f"{API_BASE_URL}/tutor/history",
+                    params={"before": older_cursor},
+                    headers=get_auth_headers()
+                )
+                if older_response.status_code == 200:
+                    history_page = older_response.json()
+                    older_turns = [(item['role'], item['message']) for item in history_page.get('history', [])]
+                    st.session_state.chat_history_by_user[st.session_state.username] = older_turns + current_user_chat_history
+                    st.session_state.history_cursor_by_user[st.session_state.username] = history_page.get('next_cursor')
+                    st.rerun()
+                else:
+                    st.warning(f"Could not load older messages: {older_response.status_code} - {older_response.json().get('detail', 'Unknown error')}")
+            except requests.exceptions.ConnectionError:
+                st.warning("Could not connect to API to fetch older messages.")
+
         if st.button("Clear Chat", key="clear_chat_button"):
             if st.session_state.username in st.session_state.chat_history_by_user:
                 st.session_state.chat_history_by_user[st.session_state.username] = []
+            st.session_state.history_cursor_by_user.pop(st.session_state.username, None)
             st.rerun()
 
  
@@ -194,39 +238,48 @@ else:
 
         if st.button("Solve Doubt"):
             if uploaded_file and file_question.strip():
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{uploaded_file.name.split('.')[-1]}") as tmp_file:
-                    tmp_file.write(uploaded_file.read())
-                    tmp_file_path = tmp_file.name
-
                 with st.spinner("Processing file..."):
                     try:
-                        extracted_text = extract_text_from_file(tmp_file_path)
-                        
-                        if "[ERROR]" in extracted_text:
-                            st.error(f"File extraction error: {extracted_text}")
+                        # Upload each file once; the API extracts it and we reuse its doc_id for later questions
+                        upload_key = f"{uploaded_file.name}:{uploaded_file.size}"
+                        doc_id = st.session_state.uploaded_doc_ids.get(upload_key)
+                        upload_error = None
+                        if doc_id is None:
+                            uploaded_file.seek(0)
+                            upload_response = requests.post(f"{API_BASE_URL}/doubt/upload",
+                                                            headers=get_auth_headers(),
+                                                            files={"file": (uploaded_file.name, uploaded_file, uploaded_file.type)})
+                            if upload_response.status_code == 200:
+                                doc_id = upload_response.json()["doc_id"]
+                                st.session_state.uploaded_doc_ids[upload_key] = doc_id
+                            else:
+                                upload_error = f"{upload_response.status_code} - {upload_response.json().get('detail', 'Unknown error')}"
+
+                        if upload_error:
+                            st.error(f"File upload error: {upload_error}")
                         else:
                             response_api = requests.post(f"{API_BASE_URL}/doubt/solve",
                                                          headers=get_auth_headers(),
                                                          json={
                                                              "file_name": uploaded_file.name,
-                                                             "context": extracted_text,
+                                                             "doc_id": doc_id,
                                                              "question": file_question
                                                          }
                                                          )
-                            
+
                             if response_api.status_code == 200:
                                 answer = response_api.json().get("answer", "No answer from AI.")
                                 st.success("Answer:")
                                 st.write(answer)
                             else:
+                                if response_api.status_code == 404:
+                                    st.session_state.uploaded_doc_ids.pop(upload_key, None)
                                 st.error(f"Error from Doubt Solver: {response_api.status_code} - {response_api.json().get('detail', 'Unknown error')}")
 
                     except requests.exceptions.ConnectionError:
                         st.error("Could not connect to the API. Make sure the backend is running.")
                     except Exception as e:
                         st.error(f"An error occurred during doubt solving: {e}")
-                
-                os.unlink(tmp_file_path)
             else:
                 st.warning("Please upload a file and enter a question.")
 
@@ -327,6 +380,10 @@ else:
    
     
     with tab4:
+        # Charting libraries load on first use, not while the login page starts up
+        import pandas as pd
+        import altair as alt
+
         st.subheader("Quiz Performance Over Time")
 
         progress_data_from_db = []
@@ -367,11 +424,22 @@ else:
 
             st.altair_chart(chart_overall, use_container_width=True)
 
-            avg_accuracy_by_subject = df.groupby('subject')['accuracy'].mean().reset_index()
+            # Per-subject averages come precomputed from the rollup table
+            summary_rows = []
+            try:
+                summary_response = requests.get(f"{API_BASE_URL}/tracker/summary", headers=get_auth_headers())
+                if summary_response.status_code == 200:
+                    summary_rows = summary_response.json().get("summary", [])
+                else:
+                    st.warning(f"Could not load subject summary: {summary_response.status_code} - {summary_response.json().get('detail', 'Unknown error')}")
+            except requests.exceptions.ConnectionError:
+                st.warning("Could not connect to the API to fetch the subject summary.")
+
+            avg_accuracy_by_subject = pd.DataFrame(summary_rows, columns=['subject', 'attempts', 'avg_accuracy'])
             chart_subject_avg = alt.Chart(avg_accuracy_by_subject).mark_bar().encode(
                 x=alt.X('subject:N', title="Subject"),
-                y=alt.Y('accuracy:Q', title="Average Accuracy (%)", scale=alt.Scale(domain=[0, 100])),
-                tooltip=['subject', alt.Tooltip('accuracy:Q', format='.2f', title='Avg Accuracy (%)')]
+                y=alt.Y('avg_accuracy:Q', title="Average Accuracy (%)", scale=alt.Scale(domain=[0, 100])),
+                tooltip=['subject', 'attempts', alt.Tooltip('avg_accuracy:Q', format='.2f', title='Avg Accuracy (%)')]
             ).properties(
                 title="Average Accuracy Per Subject"
             ).interactive()
@@ -1,5 +1,5 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse, RedirectResponse, Response
 from ai_tutor_platform.api import (
     tutor_routes,
     quiz_routes,
@@ -8,10 +8,18 @@ from ai_tutor_platform.api import (
     auth_routes # <-- ADD THIS IMPORT
 )
 from ai_tutor_platform.api.auth_routes import get_current_user, User # <-- Import user for dependency
+from ai_tutor_platform.config.configuration import config_instance
+from ai_tutor_platform.modules.quiz.question_bank import question_bank_refiller
+from ai_tutor_platform.db.repository import database
+from ai_tutor_platform.db.write_behind import write_behind
+from ai_tutor_platform.modules.auth.password_hashing import password_hasher
+from ai_tutor_platform.modules.tutor.memory import tutor_memory
+from ai_tutor_platform.llm.scheduler import LLMOverloadedError
+from ai_tutor_platform.monitoring.metrics import MetricsMiddleware, render_metrics
 
-# Assuming setup_db_schema is defined in pg_client.py and imported.
+# setup_db_schema (async) is defined in db/repository.py.
 # It's better to run initial schema creation manually in production.
-# from ai_tutor_platform.db.pg_client import setup_db_schema
+# from ai_tutor_platform.db.repository import setup_db_schema
 
 app = FastAPI(
     title="AI Tutoring Platform",
@@ -19,6 +27,47 @@ app = FastAPI(
     version="1.0.0"
 )
 
+if config_instance.get_metrics_enabled():
+    app.add_middleware(MetricsMiddleware)
+
+@app.on_event("startup")
+async def start_background_workers():
+    try:
+        await database.connect()
+    except Exception as e:
+        # Keep serving; the pool is retried on first use
+        print(f"Error initializing database pool: {e}")
+    if config_instance.get_quiz_bank_enabled():
+        question_bank_refiller.start()
+    if config_instance.get_write_behind_enabled():
+        write_behind.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    await question_bank_refiller.stop()
+    await tutor_memory.stop()
+    # Drain buffered chat/doubt rows so nothing is lost on a clean shutdown
+    await write_behind.stop()
+    password_hasher.shutdown()
+    await database.close()
+
+@app.exception_handler(LLMOverloadedError)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloadedError):
+    # The LLM scheduler's queue is full: fail fast and tell the client when to retry
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Prometheus scrape endpoint; keep it reachable only from the monitoring network
+    if not config_instance.get_metrics_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 # Optional: Redirect root to Streamlit UI
 @app.get("/", include_in_schema=False)
 def redirect_to_ui():
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from ai_tutor_platform.config.configuration import config_instance
+
+# Raising bcrypt_rounds in config.ini makes existing hashes "deprecated"; they are
+# upgraded transparently the next time their owner logs in (see verify_and_update).
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=config_instance.get_auth_bcrypt_rounds()
+)
+
+
+class HasherBusyError(Exception):
+    """Raised instead of queueing when the hashing pool already has its maximum backlog."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated, fixed-size thread pool (bcrypt releases the GIL, so the
+    threads hash in parallel) instead of on the event loop. At most `workers + max_pending`
+    hashes are admitted at once; beyond that callers get HasherBusyError immediately, so a
+    login burst turns into fast 503s rather than an ever-growing queue of slow requests.
+    """
+    def __init__(self, workers: int, max_pending: int, context: CryptContext = pwd_context):
+        self.context = context
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self.rejected = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return self._executor
+
+    async def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusyError("Password hashing pool is saturated")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Free the slot when the hash actually finishes, even if the awaiting request was cancelled
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new_hash): new_hash is set when the stored hash uses outdated parameters."""
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    async def dummy_verify(self):
+        """Spends the same time as a real check, so unknown usernames cannot be told apart by timing."""
+        await self._run(self.context.dummy_verify)
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=config_instance.get_auth_hash_workers() or os.cpu_count() or 1,
+    max_pending=config_instance.get_auth_hash_max_pending()
+)
@@ -0,0 +1,39 @@
+from typing import Any, Awaitable, Callable, Optional
+
+from ai_tutor_platform.config.configuration import config_instance
+from ai_tutor_platform.llm.response_cache import LRUTTLCache
+
+# Cached result for a username the database does not know, so repeated lookups stay cheap too
+_MISSING = object()
+
+
+class PrincipalCache:
+    """
+    TTL-bounded, in-process cache of authenticated principals keyed by username. Used only
+    when token validation is configured to confirm the user still exists in the database;
+    entries (including "no such user") expire after `ttl_seconds` and are dropped
+    explicitly with invalidate() whenever the user's row changes.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._cache = LRUTTLCache(max_entries, ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(self, username: str, loader: Callable[[str], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        cached = self._cache.get(username)
+        if cached is not None:
+            self.hits += 1
+            return None if cached is _MISSING else cached
+        self.misses += 1
+        principal = await loader(username)
+        self._cache.set(username, _MISSING if principal is None else principal)
+        return principal
+
+    def invalidate(self, username: str):
+        self._cache.delete(username)
+
+
+principal_cache = PrincipalCache(
+    max_entries=config_instance.get_auth_principal_cache_max_entries(),
+    ttl_seconds=config_instance.get_auth_principal_cache_ttl_seconds()
+)
@@ -1,8 +1,23 @@
+import asyncio
+import re
+import secrets
+import time
 from pathlib import Path
-import fitz
-import pytesseract
-from PIL import Image
-from ai_tutor_platform.llm.mistral_chain import generate_response 
+from typing import Optional, Tuple
+from ai_tutor_platform.llm.mistral_chain import generate_response, agenerate_response
+from ai_tutor_platform.llm.scheduler import LLMOverloadedError
+from ai_tutor_platform.modules.doubt_solver.retrieval import select_context
+from ai_tutor_platform.modules.doubt_solver.text_cache import cached_extraction, text_cache, cache_key, file_digest, is_cacheable
+from ai_tutor_platform.modules.doubt_solver.pdf_extractor import extract_pdf_text
+from ai_tutor_platform.monitoring.metrics import EXTRACTION_SECONDS
+
+def build_doubt_prompt(context: str, question: str) -> str:
+    return (
+        f"Here is the context from the user's uploaded file:\n\n"
+        f"{context}\n\n"
+        f"Based on the above, answer the following question:\n{question}"
+    )
+
 
 def solve_doubt(context: str, question: str) -> str:
     """
@@ -11,11 +26,7 @@ def solve_doubt(context: str, question: str) -> str:
     if not context.strip() or not question.strip():
         return "Both file content and question must be provided."
 
-    prompt = (
-        f"Here is the context from the user's uploaded file:\n\n"
-        f"{context}\n\n"
-        f"Based on the above, answer the following question:\n{question}"
-    )
+    prompt = build_doubt_prompt(select_context(context, question), question)
 
     try:
         return generate_response(prompt)
@@ -23,6 +34,26 @@ def solve_doubt(context: str, question: str) -> str:
         return f"[ERROR] {str(e)}"
 
 
+async def asolve_doubt(context: str, question: str, user_id: Optional[str] = None) -> str:
+    """
+    Async version of solve_doubt for use from async route handlers.
+    """
+    if not context.strip() or not question.strip():
+        return "Both file content and question must be provided."
+
+    # Chunking and BM25 scoring are CPU-bound, so keep them off the event loop
+    loop = asyncio.get_running_loop()
+    relevant_context = await loop.run_in_executor(None, select_context, context, question)
+    prompt = build_doubt_prompt(relevant_context, question)
+
+    try:
+        return await agenerate_response(prompt, user_id=user_id)
+    except LLMOverloadedError:
+        raise
+    except Exception as e:
+        return f"[ERROR] {str(e)}"
+
+
 def extract_text_from_file(file_path: str) -> str:
     ext = Path(file_path).suffix.lower()
 
@@ -36,17 +67,15 @@ def extract_text_from_file(file_path: str) -> str:
         return "[ERROR] Unsupported file format."
 
 
+@cached_extraction("pdf")
 def extract_text_from_pdf(file_path: str) -> str:
     try:
-        text = ""
-        with fitz.open(file_path) as doc:
-            for page in doc:
-                text += page.get_text()
-        return text.strip()
+        return extract_pdf_text(file_path)
     except Exception as e:
         return f"[ERROR reading PDF] {str(e)}"
 
 
+@cached_extraction("txt")
 def extract_text_from_txt(file_path: str) -> str:
     try:
         with open(file_path, "r", encoding="utf-8") as f:
@@ -55,8 +84,12 @@ def extract_text_from_txt(file_path: str) -> str:
         return f"[ERROR reading TXT] {str(e)}"
 
 
+@cached_extraction("image")
 def extract_text_from_image(file_path: str) -> str:
     try:
+        # Imported here so OCR dependencies only load when an image is actually processed
+        import pytesseract
+        from PIL import Image
         img = Image.open(file_path)
         return pytesseract.image_to_string(img)
     except Exception as e:
@@ -73,11 +106,57 @@ def solve_doubt_from_file(file_path: str, question: str) -> str:
 
     prompt = (
         f"Here is the content extracted from the uploaded file:\n\n"
-        f"{context}\n\n"
+        f"{select_context(context, question)}\n\n"
         f"Based on this content, answer the following question:\n{question}"
     )
 
     try:
         return generate_response(prompt)
     except Exception as e:
-        return f"[ERROR LLM] {str(e)}"
\ No newline at end of file
+        return f"[ERROR LLM] {str(e)}"
+
+
+# ------------ Uploaded documents ------------
+# Uploaded documents are identified by their extraction cache key, so the text store is
+# shared by every API worker that can see the cache directory.
+SUPPORTED_UPLOAD_TYPES = {".pdf": "pdf", ".txt": "txt", ".png": "image", ".jpg": "image", ".jpeg": "image"}
+_DOC_ID_RE = re.compile(r"^[0-9a-f]{64}-[a-z]+-\d+(-p[0-9a-f]{8})?$")
+
+
+def extract_document(file_path: str, digest: Optional[str] = None) -> Tuple[Optional[str], str]:
+    """
+    Extracts a stored upload and keeps the text for later questions.
+    Returns (doc_id, text), or (None, error_message) if extraction failed.
+    Pass `digest` when the SHA-256 was already computed while receiving the file.
+    """
+    file_type = SUPPORTED_UPLOAD_TYPES.get(Path(file_path).suffix.lower())
+    if file_type is None:
+        return None, "[ERROR] Unsupported file format."
+
+    start = time.perf_counter()
+    doc_id = cache_key(digest or file_digest(file_path), file_type)
+    text = text_cache.get(doc_id)
+    if text is not None:
+        EXTRACTION_SECONDS.labels(file_type, "hit").observe(time.perf_counter() - start)
+        return doc_id, text
+
+    extractors = {"pdf": extract_text_from_pdf, "txt": extract_text_from_txt, "image": extract_text_from_image}
+    # Call the undecorated extractor (the file has already been hashed and is stored below),
+    # so it is timed here rather than by cached_extraction
+    text = extractors[file_type].__wrapped__(file_path)
+    EXTRACTION_SECONDS.labels(file_type, "miss").observe(time.perf_counter() - start)
+    if text.startswith("[ERROR"):
+        return None, text
+    if not is_cacheable(text):
+        # Incomplete text still serves this upload's questions, but under a one-off id,
+        # so the next upload of the same file is extracted again
+        doc_id = f"{doc_id}-p{secrets.token_hex(4)}"
+    text_cache.put(doc_id, text, file_type)
+    return doc_id, text
+
+
+def load_document(doc_id: str) -> Optional[str]:
+    """Text of a previously uploaded document, or None if the id is unknown or was evicted."""
+    if not _DOC_ID_RE.match(doc_id):
+        return None
+    return text_cache.get(doc_id)
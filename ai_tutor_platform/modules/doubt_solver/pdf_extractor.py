@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple
+
+from ai_tutor_platform.config.configuration import config_instance
+from ai_tutor_platform.modules.doubt_solver.text_cache import INCOMPLETE_EXTRACTION_NOTE
+
+_executor = None
+_executor_lock = threading.Lock()
+# How long past the document deadline to wait for ranges that have not returned yet
+# (e.g. stuck inside PyMuPDF) before giving up on them
+_ABANDON_GRACE_SECONDS = 30
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = config_instance.get_pdf_workers() or os.cpu_count() or 1
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        return _executor
+
+
+def _reset_executor(broken: ProcessPoolExecutor):
+    """Drops a pool whose worker died, so the next extraction starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False)
+
+
+def _ocr_page(page, dpi: int, timeout: float) -> str:
+    import pytesseract
+    from PIL import Image
+    pix = page.get_pixmap(dpi=dpi, alpha=False)
+    img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    # pytesseract kills the tesseract process and raises RuntimeError once `timeout` passes
+    return pytesseract.image_to_string(img, timeout=timeout)
+
+
+def _extract_page_range(file_path: str, start: int, stop: int, ocr_dpi: int, deadline: float) -> List[str]:
+    """
+    Worker-process task: text of pages [start, stop). Pages with no text layer but with
+    embedded images (scans) are rasterized and OCRed. `deadline` is the document's
+    time.time() deadline: a range that only starts after it returns nothing, and OCR is
+    cut off when it is reached.
+    """
+    import fitz # PyMuPDF; imported on use so the API starts without loading it
+    texts = []
+    with fitz.open(file_path) as doc:
+        for page_no in range(start, stop):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            page = doc[page_no]
+            text = page.get_text()
+            if not text.strip() and ocr_dpi and page.get_images():
+                try:
+                    text = _ocr_page(page, ocr_dpi, remaining)
+                except Exception as e:
+                    text = ""
+                    print(f"OCR failed for page {page_no + 1} of {file_path}: {e}")
+            texts.append(text)
+    return texts
+
+
+def _run_ranges(file_path: str, ranges: List[Tuple[int, int]], ocr_dpi: int, deadline: float) -> Tuple[list, list]:
+    """
+    Runs the page ranges on the shared process pool. Returns the page texts per range
+    ([] for a range that failed or never finished) and the worker exceptions. Ranges stop
+    themselves at `deadline`; one that has still not returned _ABANDON_GRACE_SECONDS later
+    is abandoned, and ranges still waiting in the pool are cancelled.
+    A pool broken by a crashed worker is replaced for the next extraction.
+    """
+    executor = _get_executor()
+    try:
+        futures = [executor.submit(_extract_page_range, file_path, start, stop, ocr_dpi, deadline) for start, stop in ranges]
+    except BrokenProcessPool:
+        # Broken by an earlier crash; a fresh pool gets one try
+        _reset_executor(executor)
+        executor = _get_executor()
+        futures = [executor.submit(_extract_page_range, file_path, start, stop, ocr_dpi, deadline) for start, stop in ranges]
+
+    wait(futures, timeout=max(0.0, deadline + _ABANDON_GRACE_SECONDS - time.time()))
+    for future in futures:
+        future.cancel()
+
+    results, errors = [], []
+    for future in futures:
+        if not future.done() or future.cancelled():
+            results.append([])
+        elif future.exception() is not None:
+            errors.append(future.exception())
+            results.append([])
+        else:
+            results.append(future.result())
+    if any(isinstance(e, BrokenProcessPool) for e in errors):
+        _reset_executor(executor)
+    return results, errors
+
+
+def extract_pdf_text(file_path: str) -> str:
+    """
+    Extracts a PDF by splitting it into page ranges that are processed in parallel in a
+    process pool, then joining the pages in order. Only the first `max_pages` pages are
+    read and the whole document gets `time_budget_seconds`: ranges still queued at that
+    point return at once, so one huge upload cannot monopolize the workers. A note is
+    appended when either cap applies.
+    Text cut short by the time budget or a failed worker carries INCOMPLETE_EXTRACTION_NOTE
+    and is not cached.
+    """
+    max_pages = config_instance.get_pdf_max_pages()
+    deadline = time.time() + config_instance.get_pdf_time_budget_seconds()
+    pages_per_task = max(1, config_instance.get_pdf_pages_per_task())
+    ocr_dpi = config_instance.get_pdf_ocr_dpi() if config_instance.get_pdf_ocr_scanned_pages() else 0
+
+    import fitz
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+    pages = min(page_count, max_pages)
+    ranges = [(start, min(start + pages_per_task, pages)) for start in range(0, pages, pages_per_task)]
+
+    if len(ranges) <= 1:
+        # Not worth the inter-process hop for a short document
+        results, errors = [_extract_page_range(file_path, 0, pages, ocr_dpi, deadline)], []
+    else:
+        results, errors = _run_ranges(file_path, ranges, ocr_dpi, deadline)
+
+    page_texts = [text for chunk in results for text in chunk]
+    text = "\n".join(page_texts).strip()
+
+    if errors:
+        print(f"PDF extraction: {len(errors)} of {len(ranges)} page ranges of {file_path} failed: {errors[0]!r}")
+        text += (
+            f"\n\n{INCOMPLETE_EXTRACTION_NOTE}; {len(errors)} of {len(ranges)} page ranges failed "
+            f"({type(errors[0]).__name__}); {len(page_texts)} of {page_count} pages were processed.]"
+        )
+    elif len(page_texts) < pages:
+        text += f"\n\n{INCOMPLETE_EXTRACTION_NOTE}; time limit reached; {len(page_texts)} of {page_count} pages were processed.]"
+    elif pages < page_count:
+        text += f"\n\n[Note: only the first {pages} of {page_count} pages were processed.]"
+    return text
@@ -0,0 +1,107 @@
+import re
+from collections import Counter
+from typing import List, Tuple
+
+from ai_tutor_platform.config.configuration import config_instance
+from ai_tutor_platform.llm.token_budget import estimate_tokens, CHARS_PER_TOKEN
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or that the this to was what "
+    "when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(text.casefold()) if w not in _STOPWORDS]
+
+
+def chunk_text(text: str, chunk_words: int, overlap_words: int) -> List[str]:
+    """Splits text into windows of `chunk_words` words, each overlapping the previous by `overlap_words`."""
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, chunk_words - overlap_words)
+    last_start = max(len(words) - overlap_words, 1)
+    return [" ".join(words[start:start + chunk_words]) for start in range(0, last_start, step)]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a list of chunks. Per-term weights are precomputed into a sparse
+    chunk x term matrix, so scoring a question is a single sparse mat-vec product.
+    """
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        # numpy/scipy are only needed for documents over the token budget, so load them on demand
+        import numpy as np
+        import scipy.sparse as sp
+
+        self.chunks = chunks
+        self.vocabulary = {}
+        rows, cols, counts = [], [], []
+        for row, chunk in enumerate(chunks):
+            for term, count in Counter(tokenize(chunk)).items():
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                counts.append(count)
+
+        num_chunks, num_terms = len(chunks), len(self.vocabulary)
+        rows = np.asarray(rows, dtype=np.int32)
+        cols = np.asarray(cols, dtype=np.int32)
+        tf = np.asarray(counts, dtype=np.float32)
+
+        doc_len = np.bincount(rows, weights=tf, minlength=num_chunks)
+        avg_len = doc_len.mean() if num_chunks else 0.0
+        doc_freq = np.bincount(cols, minlength=num_terms)
+        idf = np.log1p((num_chunks - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        norm = k1 * (1.0 - b + b * doc_len[rows] / (avg_len or 1.0))
+        weights = idf[cols] * tf * (k1 + 1.0) / (tf + norm)
+        self.weights = sp.csr_matrix((weights, (rows, cols)), shape=(num_chunks, num_terms), dtype=np.float32)
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """Returns up to `top_k` (chunk index, score) pairs with a positive score, best first."""
+        import numpy as np
+
+        term_ids = [self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary]
+        if not term_ids or top_k <= 0:
+            return []
+        query_vec = np.bincount(term_ids, minlength=len(self.vocabulary)).astype(np.float32)
+        scores = self.weights @ query_vec
+        top_k = min(top_k, len(scores))
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        ranked = candidates[np.argsort(-scores[candidates])]
+        return [(int(i), float(scores[i])) for i in ranked if scores[i] > 0]
+
+
+def select_context(text: str, question: str, top_k: int = None, token_budget: int = None) -> str:
+    """
+    Reduces a document to the excerpts most relevant to `question`, so the prompt size stays
+    roughly constant however long the document is. Documents that already fit in the
+    token budget are returned unchanged.
+    """
+    top_k = top_k or config_instance.get_doubt_top_k()
+    token_budget = token_budget or config_instance.get_doubt_context_token_budget()
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    chunks = chunk_text(text, config_instance.get_doubt_chunk_words(), config_instance.get_doubt_chunk_overlap_words())
+    ranked = [i for i, _ in BM25Index(chunks).search(question, top_k)]
+    if not ranked:
+        # Nothing matched the question's terms; the start of the document is the best guess
+        ranked = list(range(min(top_k, len(chunks))))
+
+    selected, used = [], 0
+    for i in ranked:
+        cost = estimate_tokens(chunks[i])
+        if used + cost > token_budget:
+            if not selected:
+                # Even the best chunk alone is over budget: keep a truncated piece of it
+                selected.append(i)
+                chunks[i] = chunks[i][: token_budget * CHARS_PER_TOKEN]
+            break
+        selected.append(i)
+        used += cost
+
+    # Present excerpts in document order so the model sees them in their original sequence
+    return "\n\n[...]\n\n".join(chunks[i] for i in sorted(selected))
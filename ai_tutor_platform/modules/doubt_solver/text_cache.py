@@ -0,0 +1,183 @@
+import functools
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from ai_tutor_platform.config.configuration import config_instance
+from ai_tutor_platform.monitoring.metrics import EXTRACTION_SECONDS
+
+# Bump the version for an extractor whenever its output changes, so stale entries stop matching.
+EXTRACTOR_VERSIONS = {
+    "pdf": "pdf-3",
+    "txt": "txt-1",
+    "image": "ocr-1",
+}
+
+_READ_CHUNK_BYTES = 1024 * 1024
+
+# Extractors end their text with this note when part of a document was lost for a transient
+# reason (time budget, crashed worker); such text is returned but never cached.
+INCOMPLETE_EXTRACTION_NOTE = "[Note: extraction incomplete"
+
+
+def is_cacheable(text: str) -> bool:
+    """False for error results and incomplete extractions, which a retry may do better on."""
+    return not text.startswith("[ERROR") and INCOMPLETE_EXTRACTION_NOTE not in text
+
+
+def file_digest(file_path: str) -> str:
+    """SHA-256 of the file contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_CHUNK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(digest: str, file_type: str) -> str:
+    return f"{digest}-{EXTRACTOR_VERSIONS[file_type]}"
+
+
+class ExtractedTextCache:
+    """
+    Content-addressed on-disk store of extracted document text. Entries are plain UTF-8
+    files named by cache key; reads refresh the file's mtime and the least recently used
+    entries are evicted once the store grows past `max_bytes`. When `pg_index` is on,
+    entry metadata is also recorded in Postgres (best effort).
+    """
+    def __init__(self, directory: str, max_bytes: int, pg_index: bool = False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.pg_index = pg_index
+        self._lock = threading.Lock()
+        self._total_bytes = None # Computed on first write
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.txt")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path) # Mark as recently used
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print(f"Extraction cache: could not read {path}: {e}")
+            return None
+        self._index_access(key)
+        return text
+
+    def put(self, key: str, text: str, file_type: str):
+        path = self._path(key)
+        data = text.encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path) # Atomic, so concurrent readers never see a partial file
+        except OSError as e:
+            print(f"Extraction cache: could not write {path}: {e}")
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        self._index_store(key, file_type, len(text), len(data))
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".txt"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Deletes least recently used entries until the store is back under 90% of its limit."""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    # --- Optional Postgres metadata index ---
+    def _index_store(self, key: str, file_type: str, char_count: int, byte_size: int):
+        if not self.pg_index:
+            return
+        try:
+            from ai_tutor_platform.db.pg_client import save_extracted_text_metadata
+            save_extracted_text_metadata(key, file_type, EXTRACTOR_VERSIONS[file_type], char_count, byte_size)
+        except Exception as e:
+            print(f"Extraction cache: metadata index update failed: {e}")
+
+    def _index_access(self, key: str):
+        if not self.pg_index:
+            return
+        try:
+            from ai_tutor_platform.db.pg_client import touch_extracted_text_metadata
+            touch_extracted_text_metadata(key)
+        except Exception as e:
+            print(f"Extraction cache: metadata index update failed: {e}")
+
+
+text_cache = ExtractedTextCache(
+    directory=config_instance.get_extract_cache_dir(),
+    max_bytes=config_instance.get_extract_cache_max_bytes(),
+    pg_index=config_instance.get_extract_cache_pg_index()
+)
+
+
+def cached_extraction(file_type: str):
+    """
+    Decorator for extract_text_from_* functions: repeat uploads of the same bytes return the
+    cached text without re-parsing or re-running OCR. Error results and incomplete
+    extractions are never cached.
+    """
+    def decorator(extract):
+        @functools.wraps(extract)
+        def wrapper(file_path: str) -> str:
+            start = time.perf_counter()
+            outcome = "miss"
+            try:
+                if not config_instance.get_extract_cache_enabled():
+                    outcome = "disabled"
+                    return extract(file_path)
+                try:
+                    key = cache_key(file_digest(file_path), file_type)
+                except OSError:
+                    return extract(file_path) # Let the extractor report the unreadable file
+                cached = text_cache.get(key)
+                if cached is not None:
+                    outcome = "hit"
+                    return cached
+                text = extract(file_path)
+                if is_cacheable(text):
+                    text_cache.put(key, text, file_type)
+                return text
+            finally:
+                EXTRACTION_SECONDS.labels(file_type, outcome).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -0,0 +1,221 @@
+import re
+from typing import List
+
+# Kept free of LLM/DB imports so it can be benchmarked and reused in isolation.
+
+_OPEN_QUOTES = {'"': '"', "'": "'", "“": '"', "”": '"', "„": '"'}
+_CLOSING_QUOTES = {'"': ('"', "“", "”"), "'": ("'",)}
+_VALID_ESCAPES = frozenset('"\\/bfnrtu')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+_STRUCTURAL_AFTER_STRING = frozenset(",:}]")
+
+# Runs of characters that need no special handling, consumed in one step
+_DOUBLE_STRING_RUN = re.compile(r'[^"\\\x00-\x1f“”]+')
+_SINGLE_STRING_RUN = re.compile(r"[^'\"\\\x00-\x1f]+")
+_BARE_RUN = re.compile(r"[^\s\"'“”„\[\]{},`]+")
+_WHITESPACE_RUN = re.compile(r"\s*")
+
+
+def _find_start(text: str):
+    """
+    Index of the first '[' whose next non-blank character is '{', and whether the
+    array bracket is present. Falls back to the first '{' (implicit array) if there is none.
+    """
+    pos = text.find("[")
+    while pos != -1:
+        nxt = _WHITESPACE_RUN.match(text, pos + 1).end()
+        if nxt < len(text) and text[nxt] == "{":
+            return pos, True
+        pos = text.find("[", pos + 1)
+    brace = text.find("{")
+    return brace, False
+
+
+def _strip_trailing_comma(out: list):
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def extract_json_array(text: str) -> str:
+    """
+    Finds the top-level JSON array of objects in raw LLM output and repairs it in a single
+    linear pass. The scanner tracks string and bracket state, so it skips prose and code
+    fences around the array and handles several common model mistakes:
+
+    - trailing commas, doubled commas and mismatched closing brackets
+    - smart quotes or single quotes used as string delimiters
+    - unescaped double quotes and raw newlines inside strings
+    - stray backslashes (e.g. LaTeX) that are not valid JSON escapes
+    - objects emitted without an enclosing array
+    - output truncated mid-object (cut back to the last complete element)
+
+    Returns the repaired array as a string, or "" if no array of objects can be recovered.
+    """
+    start, has_bracket = _find_start(text)
+    if start == -1:
+        return ""
+
+    n = len(text)
+    out = ["["]
+    stack = ["]"]
+    i = start + 1 if has_bracket else start
+    last_complete = None # len(out) right after the last element closed at depth 1
+
+    while i < n:
+        ch = text[i]
+
+        if len(stack) == 1:
+            # Between top-level elements only objects matter; prose, commas and stray brackets are dropped
+            if ch == "{":
+                if last_complete is not None:
+                    out.append(",")
+                stack.append("}")
+                out.append("{")
+            elif ch == "]" and has_bracket:
+                out.append("]")
+                return "".join(out)
+            i += 1
+            continue
+
+        if ch in _OPEN_QUOTES:
+            # --- String literal: always re-emitted with double quotes ---
+            quote = _OPEN_QUOTES[ch]
+            closers = _CLOSING_QUOTES[quote]
+            run_re = _DOUBLE_STRING_RUN if quote == '"' else _SINGLE_STRING_RUN
+            out.append('"')
+            i += 1
+            while i < n:
+                run = run_re.match(text, i)
+                if run:
+                    out.append(run.group())
+                    i = run.end()
+                    if i >= n:
+                        break
+                c = text[i]
+                i += 1
+                if c == "\\":
+                    nxt = text[i] if i < n else ""
+                    if nxt and nxt in _VALID_ESCAPES:
+                        out.append(c + nxt)
+                        i += 1
+                    elif nxt == "'":
+                        out.append("'") # \' is not a JSON escape
+                        i += 1
+                    else:
+                        out.append("\\\\")
+                elif c in closers:
+                    # A quote only ends the string if structure follows; otherwise it is content
+                    after = _WHITESPACE_RUN.match(text, i).end()
+                    if after >= n or text[after] in _STRUCTURAL_AFTER_STRING:
+                        break
+                    out.append('\\"' if c == '"' else c)
+                elif c == '"':
+                    out.append('\\"') # double quote inside a single-quoted string
+                elif c in _CONTROL_ESCAPES:
+                    out.append(_CONTROL_ESCAPES[c])
+                elif c < " ":
+                    out.append("\\u%04x" % ord(c))
+                else:
+                    out.append(c) # smart quote that does not close this string
+            out.append('"')
+            continue
+
+        if ch == "{" or ch == "[":
+            if out[-1] in ("}", "]", '"'):
+                out.append(",") # Missing comma between elements
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch == "}" or ch == "]":
+            _strip_trailing_comma(out)
+            out.append(stack.pop()) # Emit the expected closer, repairing mismatches
+            if len(stack) == 1:
+                last_complete = len(out)
+        elif ch == ",":
+            if out[-1] not in (",", "[", "{", ":"):
+                out.append(",")
+        elif ch == ":":
+            out.append(":")
+        elif ch.isspace() or ch == "`":
+            pass
+        else:
+            run = _BARE_RUN.match(text, i)
+            out.append(run.group())
+            i = run.end()
+            continue
+        i += 1
+
+    # Input ended before the array closed: keep every element that did complete
+    if last_complete is None:
+        return ""
+    out = out[:last_complete]
+    out.append("]")
+    return "".join(out)
+
+
+# Runs the streaming item scanner can skip: string contents, and anything outside strings but brackets and quotes
+_STREAM_STRING_RUN = re.compile(r'[^"\\]+')
+_STREAM_BARE_RUN = re.compile(r'[^"\[\]{}]+')
+
+
+class StreamingItemScanner:
+    """
+    Incremental companion to extract_json_array for streamed completions. Fed the chunks
+    of a completion as they arrive, it returns the raw text of every object that closes
+    directly inside an array (the quiz items, whether the array is bare or wrapped in an
+    object) as soon as its closing brace arrives. It only tracks bracket and string state
+    and does not repair anything: pass each item through extract_json_array before json.loads.
+    """
+    def __init__(self):
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._item_depth = None # len(_stack) outside the item currently being read
+        self._item_parts = []
+
+    def feed(self, chunk: str) -> List[str]:
+        items = []
+        item_start = 0 if self._item_depth is not None else None
+        i, n = 0, len(chunk)
+        while i < n:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    i += 1
+                    continue
+                run = _STREAM_STRING_RUN.match(chunk, i)
+                if run:
+                    i = run.end()
+                    continue
+                if chunk[i] == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                i += 1
+                continue
+
+            run = _STREAM_BARE_RUN.match(chunk, i)
+            if run:
+                i = run.end()
+                continue
+            ch = chunk[i]
+            if ch == '"':
+                self._in_string = True
+            elif ch == "[" or ch == "{":
+                if ch == "{" and self._item_depth is None and self._stack and self._stack[-1] == "[":
+                    self._item_depth = len(self._stack)
+                    self._item_parts = []
+                    item_start = i
+                self._stack.append(ch)
+            else:
+                if self._stack:
+                    self._stack.pop()
+                if self._item_depth is not None and len(self._stack) == self._item_depth:
+                    self._item_parts.append(chunk[item_start:i + 1])
+                    items.append("".join(self._item_parts))
+                    self._item_depth = None
+                    item_start = None
+            i += 1
+
+        if item_start is not None:
+            self._item_parts.append(chunk[item_start:]) # Item continues in the next chunk
+        return items
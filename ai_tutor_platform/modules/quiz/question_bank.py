@@ -0,0 +1,167 @@
+import asyncio
+import time
+from typing import List, Dict, Any, Optional
+
+from ai_tutor_platform.config.configuration import config_instance
+from ai_tutor_platform.db.repository import (
+    save_quiz_questions,
+    sample_quiz_questions,
+    count_quiz_questions_by_subject
+)
+from ai_tutor_platform.modules.quiz.quiz_generator import acollect_quiz_questions, question_key
+from ai_tutor_platform.llm.scheduler import Priority
+
+
+def bank_subject(subject: str) -> str:
+    """Subjects are stored case-insensitively so "math" and "Math" share one stock."""
+    return " ".join(subject.split()).lower()
+
+
+def with_question_hashes(questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [dict(q, question_hash=question_key(q["question"])) for q in questions]
+
+
+class QuestionBankRefiller:
+    """
+    Background task that keeps every subject's stock of validated questions between
+    the low watermark and the target. Topics are free text, so a topic outside the
+    configured list is only stocked once draws have come up short for it
+    `demand_threshold` times within a demand window, and at most
+    `max_demand_topics` such topics are refilled per window.
+    """
+    # Bounds the memory spent counting requests for unconfigured topics within a window
+    MAX_TRACKED_TOPICS = 10000
+
+    def __init__(self):
+        self.subjects = [bank_subject(s) for s in config_instance.get_quiz_bank_subjects()]
+        self.low_watermark = config_instance.get_quiz_bank_low_watermark()
+        self.target_stock = config_instance.get_quiz_bank_target_stock()
+        self.batch_size = config_instance.get_quiz_bank_refill_batch_size()
+        self.interval_seconds = config_instance.get_quiz_bank_refill_interval_seconds()
+        self.demand_threshold = config_instance.get_quiz_bank_demand_threshold()
+        self.demand_window_seconds = config_instance.get_quiz_bank_demand_window_seconds()
+        self.max_demand_topics = config_instance.get_quiz_bank_max_demand_topics()
+        self._task = None
+        self._wakeup = None
+        self._demanded = set()
+        self._demand_counts: Dict[str, int] = {}
+        self._demand_refilled = set()
+        self._window_start = time.monotonic()
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def request_refill(self, subject: str):
+        """
+        Records that a draw for `subject` came up short. Configured subjects, and topics
+        that have now reached the demand threshold, are checked on the refiller's next
+        pass without waiting for the interval.
+        """
+        key = bank_subject(subject)
+        if key not in self.subjects:
+            self._roll_demand_window()
+            count = self._demand_counts.get(key, 0)
+            if count == 0 and len(self._demand_counts) >= self.MAX_TRACKED_TOPICS:
+                return
+            self._demand_counts[key] = count + 1
+            if count + 1 < self.demand_threshold:
+                return
+        self._demanded.add(key)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _roll_demand_window(self):
+        if time.monotonic() - self._window_start >= self.demand_window_seconds:
+            self._window_start = time.monotonic()
+            self._demand_counts.clear()
+            self._demand_refilled.clear()
+
+    def _admit_demanded(self, subjects: List[str]) -> List[str]:
+        """The demanded topics that fit this window's cap on distinct unconfigured topics."""
+        self._roll_demand_window()
+        admitted = []
+        for subject in subjects:
+            if subject in self.subjects:
+                continue
+            if subject not in self._demand_refilled:
+                if len(self._demand_refilled) >= self.max_demand_topics:
+                    print(f"Question bank: not refilling '{subject}', {self.max_demand_topics} requested topics already refilled this window.")
+                    continue
+                self._demand_refilled.add(subject)
+            admitted.append(subject)
+        return admitted
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refill_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Question bank refill failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def refill_once(self):
+        stock = await count_quiz_questions_by_subject()
+        subjects = self.subjects + self._admit_demanded(sorted(self._demanded))
+        self._demanded.clear()
+        for subject in subjects:
+            available = stock.get(subject, 0)
+            if available >= self.low_watermark:
+                continue
+            print(f"Question bank: '{subject}' has {available} questions, refilling to {self.target_stock}.")
+            while available < self.target_stock:
+                batch = await acollect_quiz_questions(subject, self.batch_size, use_cache=False, priority=Priority.BATCH)
+                if not batch:
+                    break
+                added = await save_quiz_questions(subject, with_question_hashes(batch))
+                if added == 0:
+                    break # The model is only repeating questions we already hold
+                available += added
+
+
+question_bank_refiller = QuestionBankRefiller()
+
+
+async def draw_quiz(subject: str, num_questions: int, user_id: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Serves a quiz straight from the bank. Returns None (and schedules a refill) when the
+    subject does not have enough stock, so the caller can fall back to live generation.
+    """
+    key = bank_subject(subject)
+    try:
+        questions = await sample_quiz_questions(key, num_questions, user_id)
+    except Exception as e:
+        print(f"Question bank draw failed for '{subject}': {e}")
+        return None
+
+    if len(questions) < num_questions:
+        question_bank_refiller.request_refill(key)
+        return None
+    return questions
+
+
+async def deposit_questions(subject: str, questions: List[Dict[str, Any]]):
+    """Adds live-generated questions to the bank so on-demand work also builds stock."""
+    valid = [q for q in questions if q.get("options")]
+    if not valid:
+        return
+    try:
+        await save_quiz_questions(bank_subject(subject), with_question_hashes(valid))
+    except Exception as e:
+        print(f"Question bank deposit failed for '{subject}': {e}")
@@ -1,11 +1,19 @@
+import asyncio
+import hashlib
 import json
 import re
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, ValidationError, field_validator, model_validator
-from ai_tutor_platform.llm.mistral_chain import generate_response
+from ai_tutor_platform.config.configuration import config_instance
+from ai_tutor_platform.llm.mistral_chain import (
+    generate_response, agenerate_response, astream_response, invalidate_cached_response, ainvalidate_cached_response
+)
+from ai_tutor_platform.llm.scheduler import Priority, LLMOverloadedError
+from ai_tutor_platform.monitoring.metrics import QUIZ_GENERATION_ATTEMPTS, QUIZ_REJECTIONS, QUIZ_TOP_UPS
+from ai_tutor_platform.modules.quiz.json_extractor import extract_json_array, StreamingItemScanner
 
-# Re-define QuizItem, extract_json_array, clean_dict_keys, parse_options if they are within this file's scope
-# Assuming they are defined in the same file as generate_quiz as per your previous context.
+# extract_json_array lives in json_extractor.py (no LLM imports) and is re-exported here.
 
 class QuizItem(BaseModel):
     question: str
@@ -26,50 +34,6 @@ class QuizItem(BaseModel):
             raise ValueError(f"Answer '{self.answer}' not found in options.")
         return self
 
-def extract_json_array(text: str) -> str:
-    # Remove common LLM non-JSON elements like code blocks.
-    # Updated regex to be more robust for potential surrounding text.
-    # It attempts to find the first JSON array.
-    
-    # Attempt to remove code block markers first
-    text = re.sub(r"```(?:json)?", "", text, flags=re.DOTALL).strip()
-
-    # Look for a top-level JSON array
-    match = re.search(r'\[\s*\{.*?\}\s*\]', text, re.DOTALL)
-    if not match:
-        # If a full array isn't found, try to find a list of objects
-        # This might capture partial output but could be useful for debugging
-        match = re.search(r'(\[\s*\{.*?\}\s*(?:,\s*\{.*?\}\s*)*\])', text, re.DOTALL)
-        if not match:
-            # If still no array, try to find individual objects and wrap them (risky)
-            # This is a last resort to try and salvage something
-            objects = re.findall(r'\{\s*".*?":\s*".*?".*?\}', text, re.DOTALL)
-            if objects:
-                text = f"[{','.join(objects)}]" # Wrap found objects in an array
-                match = re.search(r'\[\s*\{.*?\}\s*\]', text, re.DOTALL)
-                if not match: return "" # Still no valid array
-            else:
-                return "" # No JSON-like structure found at all
-
-    json_str = match.group(0) if match else "" # Ensure json_str is empty if no match
-
-    # Fix common formatting issues
-    json_str = re.sub(r",\s*}", "}", json_str)
-    json_str = re.sub(r",\s*]", "]", json_str)
-    json_str = json_str.replace("“", '"').replace("”", '"').replace("‘", "'").replace("’", "'")
-    # This regex attempts to fix escaped quotes that might be doubled or malformed.
-    # More aggressively, it handles some common LLM quirks, but can be brittle.
-    json_str = re.sub(r'(?<!\\)"(?!\\)', r'\"', json_str) # Escape unescaped double quotes that are not part of valid JSON structure. (This might be too aggressive)
-    json_str = re.sub(r"\\\"", r'"', json_str) # Correct already escaped quotes
-    json_str = re.sub(r'\\(?![ntr"\\/bfu])', r'\\\\', json_str) # Escape backslashes correctly for JSON
-
-    # Add a check for empty string or non-JSON-like string after cleaning
-    if not json_str.strip() or not (json_str.strip().startswith('[') and json_str.strip().endswith(']')):
-        print(f"DEBUG: extract_json_array returning empty/malformed after cleaning. Final string: '{json_str}'")
-        return "" # Return empty string if it's clearly not a JSON array
-
-    return json_str
-
 def clean_dict_keys(data: list) -> list:
     cleaned = []
     for item in data:
@@ -90,97 +54,134 @@ def parse_options(raw_options):
     return []
 
 
-def generate_quiz(subject: str, num_questions: int = 5, max_retries: int = 3) -> list:
-    prompt_template = (
-        "Generate exactly {num} multiple-choice questions on the topic '{subject}'.\n"
-        "Each question must have exactly 4 distinct options and one clearly correct answer.\n"
-        "The correct answer must be one of the 4 options provided in the 'options' list.\n"
-        "Ensure the 'answer' field matches one of the 'options' exactly.\n"
-        "Respond with ONLY a valid JSON array. Do NOT include any introductory text, explanations, code blocks (like ```json), or markdown outside the JSON.\n"
-        "Avoid emojis, LaTeX, or any other special characters not standard in plain text.\n"
-        "Example JSON format:\n"
-        "[\n"
-        "  {{\n"
-        "    \"question\": \"What is the capital of France?\",\n"
-        "    \"options\": [\"London\", \"Berlin\", \"Paris\", \"Rome\"],\n"
-        "    \"answer\": \"Paris\"\n"
-        "  }}\n"
-        "]"
-    )
-
+QUIZ_PROMPT_TEMPLATE = (
+    "Generate exactly {num} multiple-choice questions on the topic '{subject}'.\n"
+    "Each question must have exactly 4 distinct options and one clearly correct answer.\n"
+    "The correct answer must be one of the 4 options provided in the 'options' list.\n"
+    "Ensure the 'answer' field matches one of the 'options' exactly.\n"
+    "Respond with ONLY a valid JSON array. Do NOT include any introductory text, explanations, code blocks (like ```json), or markdown outside the JSON.\n"
+    "Avoid emojis, LaTeX, or any other special characters not standard in plain text.\n"
+    "Example JSON format:\n"
+    "[\n"
+    "  {{\n"
+    "    \"question\": \"What is the capital of France?\",\n"
+    "    \"options\": [\"London\", \"Berlin\", \"Paris\", \"Rome\"],\n"
+    "    \"answer\": \"Paris\"\n"
+    "  }}\n"
+    "]"
+)
+
+# Structured-output prompt (JSON mode and stream mode): JSON mode only guarantees an object,
+# so the questions are wrapped in one, and each item is described by the QuizItem schema.
+QUIZ_JSON_PROMPT_TEMPLATE = (
+    "Generate exactly {num} multiple-choice questions on the topic '{subject}'.\n"
+    "Each question must have exactly 4 distinct options and one clearly correct answer.\n"
+    "The 'answer' field must match one of the 4 'options' exactly.\n"
+    "Avoid emojis, LaTeX, or any other special characters not standard in plain text.\n"
+    "Respond with a JSON object whose only key is \"questions\", an array of question objects.\n"
+    "Each question object must match this JSON schema:\n"
+    "{schema}"
+)
+QUIZ_ITEM_SCHEMA = json.dumps(QuizItem.model_json_schema())
+
+
+def validate_quiz_item(item: dict, index: int) -> Optional[Dict[str, Any]]:
+    """Normalizes and validates one parsed quiz item; returns the question dict, or None if it was rejected."""
+    try:
+        # Defensive parsing for required fields
+        question = item.get("question")
+        raw_options = item.get("options")
+        answer = item.get("answer")
+
+        if not question or not raw_options or not answer:
+            raise ValueError("Missing 'question', 'options', or 'answer' field in quiz item.")
+
+        question = question.strip()
+        answer = answer.strip()
+        options = parse_options(raw_options)
+
+        # Validate the QuizItem using the Pydantic model
+        quiz_item = QuizItem(question=question, options=options, answer=answer)
+        return {
+            "question": quiz_item.question,
+            "options": quiz_item.options,
+            "answer": quiz_item.answer
+        }
+    except ValidationError as e:
+        print(f"⚠️ Skipped question from LLM output (index {index}) due to Pydantic validation error: {e}. Item: {item}")
+        QUIZ_REJECTIONS.labels("invalid_question").inc()
+    except ValueError as e: # Catch value errors from parsing or missing fields
+        print(f"⚠️ Skipped question from LLM output (index {index}) due to data format error: {e}. Item: {item}")
+        QUIZ_REJECTIONS.labels("malformed_question").inc()
+    except Exception as e:
+        print(f"⚠️ Skipped question from LLM output (index {index}) due to unexpected error during item processing: {e}. Item: {item}")
+        QUIZ_REJECTIONS.labels("malformed_question").inc()
+    return None
+
+
+def _structured_items(raw_output: str) -> Optional[list]:
+    """The question list of a JSON-mode completion parsed as is, or None if it is not the expected shape."""
+    try:
+        data = json.loads(raw_output)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(data, dict):
+        data = data.get("questions", next((v for v in data.values() if isinstance(v, list)), None))
+    return data if isinstance(data, list) else None
+
+
+def parse_quiz_output(raw_output: str, attempt: int, needed: int, json_mode: bool = False) -> list:
+    """
+    Extracts, parses and validates quiz items from one raw LLM completion.
+    Returns at most `needed` validated question dicts (possibly none). A JSON-mode
+    completion is parsed directly; the repairing extractor is only the fallback.
+    """
+    print(f"\n==== RAW LLM OUTPUT (Attempt {attempt + 1}) ====\n'{raw_output}'") # Added quotes for visibility of empty/whitespace
+
+    if not raw_output.strip(): # Check for empty or whitespace-only response early
+        print(f"💥 LLM returned empty or whitespace-only response on Attempt {attempt + 1}. Retrying...")
+        QUIZ_REJECTIONS.labels("empty_output").inc()
+        return []
+
+    quiz_data = _structured_items(raw_output) if json_mode else None
+    if quiz_data is not None:
+        return _validate_items(clean_dict_keys(quiz_data), needed)
+
+    cleaned_json_str = extract_json_array(raw_output)
+    print(f"\n==== CLEANED JSON (Attempt {attempt + 1}) ====\n'{cleaned_json_str}'") # Added quotes for visibility
+
+    if not cleaned_json_str.strip(): # Check if cleaning resulted in empty string
+        print(f"💥 No valid JSON array could be extracted from LLM output on Attempt {attempt + 1}. Retrying...")
+        QUIZ_REJECTIONS.labels("no_json").inc()
+        return []
+
+    try:
+        quiz_data = json.loads(cleaned_json_str)
+        if not isinstance(quiz_data, list): # Ensure it's a list at the top level
+            raise ValueError("JSON parsed but not a list of questions.")
+    except json.JSONDecodeError as jde:
+        print(f"💥 json.loads failed (Attempt {attempt + 1}): {jde}. Cleaned JSON was: '{cleaned_json_str[:200]}...'")
+        QUIZ_REJECTIONS.labels("bad_json").inc()
+        return []
+
+    return _validate_items(clean_dict_keys(quiz_data), needed)
+
+
+def _validate_items(quiz_data: list, needed: int) -> list:
     valid_questions = []
+    for i, item in enumerate(quiz_data):
+        valid = validate_quiz_item(item, i)
+        if valid is not None: # Append only validated items
+            valid_questions.append(valid)
+            if len(valid_questions) >= needed:
+                break # Stop if we have enough valid questions
+    return valid_questions
 
-    for attempt in range(max_retries):
-        needed = num_questions - len(valid_questions)
-        if needed <= 0:
-            break
-
-        prompt = prompt_template.format(subject=subject, num=needed)
-
-        try:
-            raw_output = generate_response(prompt)
-            print(f"\n==== RAW LLM OUTPUT (Attempt {attempt + 1}) ====\n'{raw_output}'") # Added quotes for visibility of empty/whitespace
-
-            if not raw_output.strip(): # Check for empty or whitespace-only response early
-                print(f"💥 LLM returned empty or whitespace-only response on Attempt {attempt + 1}. Retrying...")
-                continue # Skip to next attempt
-
-            cleaned_json_str = extract_json_array(raw_output)
-            print(f"\n==== CLEANED JSON (Attempt {attempt + 1}) ====\n'{cleaned_json_str}'") # Added quotes for visibility
-
-            if not cleaned_json_str.strip(): # Check if cleaning resulted in empty string
-                print(f"💥 No valid JSON array could be extracted from LLM output on Attempt {attempt + 1}. Retrying...")
-                continue # Skip to next attempt
-
-            try:
-                quiz_data = json.loads(cleaned_json_str)
-                if not isinstance(quiz_data, list): # Ensure it's a list at the top level
-                    raise ValueError("JSON parsed but not a list of questions.")
-            except json.JSONDecodeError as jde:
-                print(f"💥 json.loads failed (Attempt {attempt + 1}): {jde}. Cleaned JSON was: '{cleaned_json_str[:200]}...'")
-                continue # Skip to next attempt
-
-            quiz_data = clean_dict_keys(quiz_data)
-
-            for i, item in enumerate(quiz_data):
-                try:
-                    # Defensive parsing for required fields
-                    question = item.get("question")
-                    raw_options = item.get("options")
-                    answer = item.get("answer")
-
-                    if not question or not raw_options or not answer:
-                        raise ValueError("Missing 'question', 'options', or 'answer' field in quiz item.")
-
-                    question = question.strip()
-                    answer = answer.strip()
-                    options = parse_options(raw_options)
-
-                    # Validate the QuizItem using the Pydantic model
-                    quiz_item = QuizItem(question=question, options=options, answer=answer)
-
-                    # Append only validated items
-                    valid_questions.append({
-                        "question": quiz_item.question,
-                        "options": quiz_item.options,
-                        "answer": quiz_item.answer
-                    })
-
-                    if len(valid_questions) >= num_questions:
-                        break # Stop if we have enough valid questions
-                except ValidationError as e:
-                    print(f"⚠️ Skipped question from LLM output (index {i}) due to Pydantic validation error: {e}. Item: {item}")
-                except ValueError as e: # Catch value errors from parsing or missing fields
-                    print(f"⚠️ Skipped question from LLM output (index {i}) due to data format error: {e}. Item: {item}")
-                except Exception as e:
-                    print(f"⚠️ Skipped question from LLM output (index {i}) due to unexpected error during item processing: {e}. Item: {item}")
-
-
-        except ValueError as ve: # Catch specific ValueError from extract_json_array or json.loads
-            print(f"💥 Error in LLM output processing (Attempt {attempt + 1}): {ve}. Raw: '{raw_output[:200]}...'")
-        except Exception as e: # Catch other general errors from generate_response or other steps
-            print(f"💥 General error in LLM generation process (Attempt {attempt + 1}): {e}. Raw output: '{raw_output[:200]}...'")
 
+def finalize_quiz(valid_questions: list, subject: str, num_questions: int, max_retries: int) -> list:
+    """
+    Turns the collected questions into the response shape, prefixing an error or warning entry on shortfall.
+    """
     if not valid_questions:
         print(f"❌ Failed to generate any valid questions after {max_retries} attempts for '{subject}'.")
         return [{
@@ -197,3 +198,287 @@ def generate_quiz(subject: str, num_questions: int = 5, max_retries: int = 3) ->
         }] + valid_questions
 
     return valid_questions
+
+
+_NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def question_key(question: str) -> str:
+    """Hash of the question text with case, punctuation and spacing normalised away."""
+    normalized = _NON_WORD_RE.sub(" ", question.casefold()).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def plan_batches(count: int, batch_size: int) -> List[int]:
+    """Splits `count` questions into near-equal batches of at most `batch_size`, e.g. 10 by 4 -> [4, 3, 3]."""
+    batch_size = max(1, batch_size)
+    num_batches = -(-count // batch_size)
+    base, extra = divmod(count, num_batches)
+    return [base + 1 if i < extra else base for i in range(num_batches)]
+
+
+def build_quiz_prompt(subject: str, num: int, batch_index: int = 0, batch_count: int = 1, avoid: List[str] = None,
+                      json_output: bool = False) -> str:
+    if json_output:
+        prompt = QUIZ_JSON_PROMPT_TEMPLATE.format(subject=subject, num=num, schema=QUIZ_ITEM_SCHEMA)
+    else:
+        prompt = QUIZ_PROMPT_TEMPLATE.format(subject=subject, num=num)
+    if batch_count > 1:
+        prompt += (
+            f"\nThis is part {batch_index + 1} of {batch_count} of a larger quiz. "
+            f"Cover a different aspect of '{subject}' than the other parts would."
+        )
+    if avoid:
+        prompt += "\nDo NOT repeat or rephrase any of these questions:\n" + "\n".join(f"- {q}" for q in avoid)
+    return prompt
+
+
+def merge_unique(collected: Dict[str, Dict[str, Any]], items: List[Dict[str, Any]]) -> int:
+    """Adds items whose normalized question text is not already collected. Returns how many were added."""
+    added = 0
+    for item in items:
+        key = question_key(item["question"])
+        if key not in collected:
+            collected[key] = item
+            added += 1
+        else:
+            print(f"⚠️ Dropped duplicate question across batches: {item['question']}")
+            QUIZ_REJECTIONS.labels("duplicate").inc()
+    return added
+
+
+def _fan_out_prompts(subject: str, needed: int, collected: Dict[str, Dict[str, Any]], json_output: bool = False) -> List[tuple]:
+    sizes = plan_batches(needed, config_instance.get_quiz_batch_size())
+    avoid = [q["question"] for q in collected.values()]
+    return [(build_quiz_prompt(subject, size, i, len(sizes), avoid, json_output), size) for i, size in enumerate(sizes)]
+
+
+def _merge_batch_output(collected: Dict[str, Dict[str, Any]], prompt: str, size: int, raw_output, attempt: int,
+                        attempt_uses_cache: bool, json_mode: bool = False) -> bool:
+    """
+    Merges one batch's valid questions into `collected`. Returns True if the completion came
+    from an attempt that may have been served from the cache and did not yield enough valid
+    questions, so the caller should evict it (sync or async, depending on the path).
+    """
+    if isinstance(raw_output, Exception):
+        print(f"💥 General error in LLM generation process (Attempt {attempt + 1}): {raw_output}")
+        return False
+    try:
+        items = parse_quiz_output(raw_output, attempt, size, json_mode)
+        merge_unique(collected, items)
+        return attempt_uses_cache and len(items) < size
+    except Exception as e:
+        print(f"💥 General error in LLM generation process (Attempt {attempt + 1}): {e}. Raw output: '{raw_output[:200]}...'")
+        return False
+
+
+def generate_quiz(subject: str, num_questions: int = 5, max_retries: int = 3, use_cache: bool = True) -> list:
+    """
+    Generates a validated quiz. Each attempt splits the missing questions into small batches
+    that are requested in parallel; duplicates across batches are dropped and only the
+    shortfall is re-requested. Only the first attempt may be served from the response cache
+    (pass use_cache=False for a fresh set), and cached completions that did not yield enough
+    valid questions are evicted. Uses JSON mode unless [QUIZ] generation_mode is text.
+    """
+    collected = {}
+    attempts_used = 0
+    json_mode = config_instance.get_quiz_generation_mode() != "text"
+
+    for attempt in range(max_retries):
+        needed = num_questions - len(collected)
+        if needed <= 0:
+            break
+
+        attempts_used += 1
+        batches = _fan_out_prompts(subject, needed, collected, json_mode)
+        attempt_uses_cache = use_cache and attempt == 0
+
+        def call(prompt):
+            try:
+                return generate_response(prompt, use_cache=attempt_uses_cache, json_mode=json_mode)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+            outputs = list(executor.map(call, [prompt for prompt, _ in batches]))
+
+        for (prompt, size), raw_output in zip(batches, outputs):
+            if _merge_batch_output(collected, prompt, size, raw_output, attempt, attempt_uses_cache, json_mode):
+                invalidate_cached_response(prompt, json_mode)
+
+    QUIZ_GENERATION_ATTEMPTS.observe(attempts_used)
+    return finalize_quiz(list(collected.values())[:num_questions], subject, num_questions, max_retries)
+
+
+class _QuizStreams:
+    """
+    One attempt of stream-mode generation. Every batch is streamed and each question is
+    validated (and de-duplicated) as soon as its object closes. When a question is rejected,
+    or a stream ends short, and the streams still running cannot make up the quiz, a top-up
+    request for the shortfall starts right away instead of waiting for the next attempt.
+    Streams that still owe questions once the quiz is complete are cancelled.
+    """
+    def __init__(self, subject: str, num_questions: int, collected: Dict[str, Dict[str, Any]], attempt: int,
+                 top_ups: int, user_id: Optional[str], priority: Priority):
+        self.subject = subject
+        self.num_questions = num_questions
+        self.collected = collected
+        self.attempt = attempt
+        self.top_ups_left = top_ups
+        self.user_id = user_id
+        self.priority = priority
+        self.batch_size = config_instance.get_quiz_batch_size()
+        # Streams are requested without response_format (JSON mode cannot stream), so their
+        # completions are cached, and must be evicted, under the free-form key
+        self.json_mode = False
+        self._pending = {} # task -> questions it may still deliver
+        self._changed = asyncio.Event()
+        self._error = None
+
+    @property
+    def complete(self) -> bool:
+        return len(self.collected) >= self.num_questions
+
+    def start(self, prompt: str, size: int, use_cache: bool):
+        task = asyncio.get_running_loop().create_task(self._stream(prompt, size, use_cache))
+        task.add_done_callback(lambda _: self._changed.set())
+        self._pending[task] = size
+
+    async def wait(self):
+        """Runs until the quiz is complete or every stream (top-ups included) has finished."""
+        try:
+            while True:
+                for task in [t for t in self._pending if t.done()]:
+                    del self._pending[task]
+                    self._top_up_if_short()
+                if not self._pending or self.complete or self._error is not None:
+                    break
+                self._changed.clear()
+                await self._changed.wait()
+            if self._error is not None:
+                raise self._error
+        finally:
+            # Abort streams that still owe questions; ones only missing their closing brackets
+            # may finish, so their completion reaches the response cache
+            tasks = list(self._pending)
+            for task in tasks:
+                if self._pending[task] or self._error is not None:
+                    task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _stream(self, prompt: str, size: int, use_cache: bool):
+        task = asyncio.current_task()
+        scanner = StreamingItemScanner()
+        parts = []
+        seen = accepted = 0
+        try:
+            async for chunk in astream_response(prompt, use_cache=use_cache, user_id=self.user_id, priority=self.priority,
+                                                json_mode=self.json_mode):
+                parts.append(chunk)
+                for item_text in scanner.feed(chunk):
+                    seen += 1
+                    self._pending[task] = max(0, size - seen)
+                    if self._accept(item_text, seen - 1):
+                        accepted += 1
+                    else:
+                        self._top_up_if_short()
+            if seen < size:
+                # The item scanner does no repair; give the whole completion to the repairing extractor
+                items = parse_quiz_output("".join(parts), self.attempt, size)
+                accepted += merge_unique(self.collected, [q for q in items if question_key(q["question"]) not in self.collected])
+            # Only a stream that ran to the end was cached; cancelled or failed ones left nothing to evict
+            if use_cache and accepted < size:
+                await ainvalidate_cached_response(prompt, self.json_mode)
+        except LLMOverloadedError as e:
+            self._error = e
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"💥 General error in LLM generation process (Attempt {self.attempt + 1}): {e}")
+
+    def _accept(self, item_text: str, index: int) -> bool:
+        try:
+            data = json.loads(extract_json_array(item_text) or "[]")
+        except json.JSONDecodeError:
+            data = []
+        items = clean_dict_keys(data)
+        if not items:
+            print(f"⚠️ Skipped unparseable question from streamed LLM output (index {index}): '{item_text[:200]}'")
+            QUIZ_REJECTIONS.labels("bad_json").inc()
+            return False
+        item = validate_quiz_item(items[0], index)
+        return item is not None and merge_unique(self.collected, [item]) > 0
+
+    def _top_up_if_short(self):
+        if self.complete or self._error is not None or self.top_ups_left <= 0:
+            return
+        short = self.num_questions - len(self.collected) - sum(self._pending.values())
+        if short <= 0:
+            return
+        self.top_ups_left -= 1
+        QUIZ_TOP_UPS.inc()
+        size = min(short, self.batch_size)
+        avoid = [q["question"] for q in self.collected.values()]
+        self.start(build_quiz_prompt(self.subject, size, avoid=avoid, json_output=True), size, use_cache=False)
+
+
+async def acollect_quiz_questions(subject: str, num_questions: int, max_retries: int = 3, use_cache: bool = True,
+                                  user_id: Optional[str] = None, priority: Priority = Priority.QUIZ) -> list:
+    """
+    Async fan-out loop behind agenerate_quiz. Returns only the validated, de-duplicated question
+    dicts, without the error/warning header entries, so callers such as the question bank can store them.
+    The LLM calls are scheduled under `priority` on behalf of `user_id`; LLMOverloadedError is re-raised.
+    In stream mode (see _QuizStreams) rejected questions are topped up within the attempt, so a
+    further attempt is only needed once the top-up budget is spent.
+    """
+    collected = {}
+    attempts_used = 0
+    mode = config_instance.get_quiz_generation_mode()
+    json_mode = mode != "text"
+    top_ups = config_instance.get_quiz_max_top_ups()
+
+    for attempt in range(max_retries):
+        needed = num_questions - len(collected)
+        if needed <= 0:
+            break
+
+        attempts_used += 1
+        batches = _fan_out_prompts(subject, needed, collected, json_mode)
+        attempt_uses_cache = use_cache and attempt == 0
+
+        if mode == "stream":
+            streams = _QuizStreams(subject, num_questions, collected, attempt, top_ups, user_id, priority)
+            for prompt, size in batches:
+                streams.start(prompt, size, attempt_uses_cache)
+            await streams.wait()
+            top_ups = streams.top_ups_left
+            continue
+
+        outputs = await asyncio.gather(
+            *(agenerate_response(prompt, use_cache=attempt_uses_cache, user_id=user_id, priority=priority, json_mode=json_mode)
+              for prompt, _ in batches),
+            return_exceptions=True
+        )
+        for raw_output in outputs:
+            if isinstance(raw_output, LLMOverloadedError):
+                raise raw_output
+
+        unusable = [
+            prompt for (prompt, size), raw_output in zip(batches, outputs)
+            if _merge_batch_output(collected, prompt, size, raw_output, attempt, attempt_uses_cache, json_mode)
+        ]
+        if unusable:
+            await asyncio.gather(*(ainvalidate_cached_response(prompt, json_mode) for prompt in unusable))
+
+    QUIZ_GENERATION_ATTEMPTS.observe(attempts_used)
+    return list(collected.values())[:num_questions]
+
+
+async def agenerate_quiz(subject: str, num_questions: int = 5, max_retries: int = 3, use_cache: bool = True,
+                         user_id: Optional[str] = None) -> list:
+    """
+    Async version of generate_quiz; awaits the LLM instead of blocking a worker thread.
+    """
+    valid_questions = await acollect_quiz_questions(subject, num_questions, max_retries, use_cache, user_id)
+    return finalize_quiz(valid_questions, subject, num_questions, max_retries)
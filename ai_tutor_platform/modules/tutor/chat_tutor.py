@@ -1,4 +1,8 @@
-from ai_tutor_platform.llm.mistral_chain import generate_response
+from typing import Optional
+
+from ai_tutor_platform.llm.mistral_chain import generate_response, agenerate_response, astream_response
+from ai_tutor_platform.llm.scheduler import LLMOverloadedError
+from ai_tutor_platform.modules.tutor.memory import tutor_memory
 
 def ask_tutor(question: str) -> str:
     """
@@ -10,4 +14,34 @@ def ask_tutor(question: str) -> str:
     try:
         return generate_response(question)
     except Exception as e:
-        return f"An error occurred while processing your question: {str(e)}"
\ No newline at end of file
+        return f"An error occurred while processing your question: {str(e)}"
+
+async def aask_tutor(question: str, user_id: Optional[str] = None) -> str:
+    """
+    Async version of ask_tutor for use from async route handlers.
+    With a user_id, the prompt carries that user's conversation memory.
+    """
+    if not question or not question.strip():
+        return "Please enter a valid question."
+
+    try:
+        prompt = await tutor_memory.build_prompt(user_id, question)
+        # Answers that depend on a user's history are not shared through the response cache
+        return await agenerate_response(prompt, use_cache=prompt == question, user_id=user_id)
+    except LLMOverloadedError:
+        raise # Answered with 503 by the API
+    except Exception as e:
+        return f"An error occurred while processing your question: {str(e)}"
+
+
+async def astream_tutor(question: str, user_id: Optional[str] = None):
+    """
+    Streams the tutor's answer chunk by chunk, with the same memory as aask_tutor.
+    """
+    if not question or not question.strip():
+        yield "Please enter a valid question."
+        return
+
+    prompt = await tutor_memory.build_prompt(user_id, question)
+    async for token in astream_response(prompt, use_cache=prompt == question, user_id=user_id):
+        yield token
@@ -0,0 +1,214 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+from ai_tutor_platform.config.configuration import config_instance
+from ai_tutor_platform.db.repository import get_chat_history_page, get_tutor_memory, save_tutor_memory
+from ai_tutor_platform.llm.mistral_chain import agenerate_response
+from ai_tutor_platform.llm.response_cache import LRUTTLCache
+from ai_tutor_platform.llm.scheduler import Priority
+from ai_tutor_platform.llm.token_budget import CHARS_PER_TOKEN, estimate_tokens
+
+SUMMARY_PROMPT = """You maintain the running memory of a tutoring conversation between a student and an AI tutor.
+Update the summary below so that it also covers the new exchanges. Keep the topics studied, what the
+student understood or struggled with, and any goals or preferences they mentioned. Drop small talk.
+Write at most {max_words} words of plain prose and return only the updated summary.
+
+Current summary:
+{summary}
+
+New exchanges:
+{turns}"""
+
+
+def _format_turn(question: str, answer: str) -> str:
+    return f"Student: {question.strip()}\nTutor: {answer.strip()}"
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    max_chars = max(0, max_tokens) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - 3)].rstrip() + "..."
+
+
+class TutorMemory:
+    """
+    Per-user conversation memory for the tutor under a hard token budget. A prompt carries
+    the last `recent_turns` exchanges verbatim plus a running summary of everything older.
+    The summary lives in the tutor_memory table together with the keyset position of the
+    last turn it covers, and is refreshed by background tasks scheduled from note_turn(),
+    so building a prompt costs one indexed history query and no LLM call.
+    """
+    def __init__(self):
+        self.enabled = config_instance.get_tutor_memory_enabled()
+        self.recent_turns = max(0, config_instance.get_tutor_memory_recent_turns())
+        self.token_budget = config_instance.get_tutor_memory_token_budget()
+        self.summary_token_budget = config_instance.get_tutor_memory_summary_token_budget()
+        self.refresh_every_turns = max(1, config_instance.get_tutor_memory_refresh_every_turns())
+        self.max_turns_per_refresh = max(1, config_instance.get_tutor_memory_max_turns_per_refresh())
+        self.max_concurrent_refreshes = max(1, config_instance.get_tutor_memory_max_concurrent_refreshes())
+        max_entries = config_instance.get_tutor_memory_cache_max_entries()
+        ttl_seconds = config_instance.get_tutor_memory_cache_ttl_seconds()
+        # user -> summary text ("" when the user has none yet)
+        self._summaries = LRUTTLCache(max_entries, ttl_seconds)
+        # user -> (recent turns noted by this process, turns since the last scheduled refresh).
+        # Covers exchanges still sitting in the write-behind buffer.
+        self._local = LRUTTLCache(max_entries, ttl_seconds)
+        self._refreshing = set()
+        self._tasks = set()
+        self._semaphore = None
+        self.stats = {"prompts": 0, "refreshes": 0, "refresh_errors": 0}
+
+    # --- Request path ---
+    async def build_prompt(self, user_id: Optional[str], question: str) -> str:
+        """
+        The question wrapped with the user's summary and recent turns, or the bare question
+        when there is no memory to add (or it cannot be read; memory is best effort).
+        """
+        if not self.enabled or not user_id:
+            return question
+        try:
+            summary = await self._get_summary(user_id)
+            turns = await self._recent(user_id)
+        except Exception as e:
+            print(f"Tutor memory: could not load memory for '{user_id}': {e}")
+            return question
+        if not summary and not turns:
+            return question
+        self.stats["prompts"] += 1
+        return self.render(summary, turns, question)
+
+    def render(self, summary: str, turns: List[Tuple[str, str]], question: str) -> str:
+        """
+        Lays out summary, turns and question within token_budget. The summary is capped at
+        summary_token_budget (and half of what the question leaves); turns are added newest
+        first and the oldest are dropped once the budget runs out. The question is never cut.
+        """
+        remaining = self.token_budget - estimate_tokens(question) - 40 # Room for the section headings
+        summary = _truncate(summary, min(self.summary_token_budget, remaining // 2)) if summary else ""
+        remaining -= estimate_tokens(summary)
+
+        kept = []
+        for question_text, answer in reversed(turns):
+            turn = _format_turn(question_text, answer)
+            cost = estimate_tokens(turn)
+            if cost > remaining:
+                if not kept and remaining > 50:
+                    # Keep at least the last exchange, shortened, so follow-ups still make sense
+                    kept.append(_truncate(turn, remaining))
+                break
+            kept.append(turn)
+            remaining -= cost
+        kept.reverse()
+
+        sections = []
+        if summary:
+            sections.append(f"Summary of the earlier conversation:\n{summary}")
+        if kept:
+            sections.append("Most recent exchanges:\n" + "\n\n".join(kept))
+        if not sections:
+            return question
+        sections.append(f"Current question:\n{question}")
+        return "\n\n".join(sections)
+
+    async def _get_summary(self, user_id: str) -> str:
+        summary = self._summaries.get(user_id)
+        if summary is None:
+            row = await get_tutor_memory(user_id)
+            summary = row["summary"] if row else ""
+            self._summaries.set(user_id, summary)
+        return summary
+
+    async def _recent(self, user_id: str) -> List[Tuple[str, str]]:
+        """Last recent_turns exchanges, oldest first, including ones not flushed to the database yet."""
+        if not self.recent_turns:
+            return []
+        rows = await get_chat_history_page(user_id, self.recent_turns)
+        turns = [(row["question"], row["answer"]) for row in reversed(rows)]
+        local = self._local.get(user_id)
+        if local is not None:
+            # Unflushed turns are always newer than the stored ones
+            turns.extend(turn for turn in local[0] if turn not in turns)
+        return turns[-self.recent_turns:]
+
+    def note_turn(self, user_id: str, question: str, answer: str):
+        """Records a finished exchange and schedules a summary refresh every refresh_every_turns turns."""
+        if not self.enabled or not user_id or answer.startswith("[ERROR"):
+            return
+        local = self._local.get(user_id)
+        turns, since_refresh = local if local is not None else ((), 0)
+        turns = (turns + ((question, answer),))[-max(1, self.recent_turns):]
+        since_refresh += 1
+        if since_refresh >= self.refresh_every_turns and self.schedule_refresh(user_id):
+            since_refresh = 0
+        self._local.set(user_id, (turns, since_refresh))
+
+    # --- Background refresh ---
+    def schedule_refresh(self, user_id: str) -> bool:
+        """Starts a refresh task for the user unless one is already running. Needs a running loop."""
+        if user_id in self._refreshing:
+            return False
+        self._refreshing.add(user_id)
+        task = asyncio.get_running_loop().create_task(self._run_refresh(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run_refresh(self, user_id: str):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_refreshes)
+        try:
+            async with self._semaphore:
+                await self.refresh(user_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats["refresh_errors"] += 1
+            print(f"Tutor memory: summary refresh for '{user_id}' failed: {e}")
+        finally:
+            self._refreshing.discard(user_id)
+
+    async def refresh(self, user_id: str) -> bool:
+        """
+        Folds turns that have dropped out of the verbatim window into the summary. Reads the
+        turns after the last one summarized, leaves the newest recent_turns alone, and
+        summarizes at most max_turns_per_refresh of the rest. Returns True if it stored a new summary.
+        """
+        row = await get_tutor_memory(user_id)
+        summary = row["summary"] if row else ""
+        since = row["summarized_id"] if row else 0
+        rows = await get_chat_history_page(user_id, self.max_turns_per_refresh + self.recent_turns, since=since)
+        older = rows[:max(0, len(rows) - self.recent_turns)]
+        if not older:
+            return False
+
+        turns = "\n\n".join(_format_turn(r["question"], r["answer"]) for r in older)
+        prompt = SUMMARY_PROMPT.format(
+            max_words=max(20, self.summary_token_budget * 3 // 4),
+            summary=summary or "(none yet)",
+            turns=turns
+        )
+        new_summary = await agenerate_response(prompt, use_cache=False, user_id=user_id, priority=Priority.BATCH)
+        if not new_summary or new_summary.startswith("[ERROR"):
+            raise RuntimeError(new_summary or "empty summary")
+        new_summary = _truncate(new_summary, self.summary_token_budget)
+
+        last = older[-1]
+        stored = await save_tutor_memory(user_id, new_summary, last["timestamp"], last["id"])
+        if stored:
+            self._summaries.set(user_id, new_summary)
+            self.stats["refreshes"] += 1
+        else:
+            self._summaries.delete(user_id) # Another worker got there first; reload theirs
+        return stored
+
+    async def stop(self):
+        """Cancels refreshes still in flight; they are picked up again after the next turns."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+tutor_memory = TutorMemory()
@@ -0,0 +1,136 @@
+import os
+import time
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+from ai_tutor_platform.llm.token_budget import estimate_tokens
+
+# Prometheus metrics for the API. Everything is defined here so the names stay in one place;
+# call sites only do a label lookup and an observe()/inc(), which costs a few microseconds.
+# With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR so /metrics aggregates all of them.
+
+_LLM_BUCKETS = (0.25, 0.5, 1, 2, 3, 5, 8, 13, 21, 34, 60)
+_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# --- HTTP ---
+HTTP_REQUEST_SECONDS = Histogram(
+    "tutor_http_request_duration_seconds", "Time to serve an API request, until the last byte is sent",
+    ["method", "route", "status"]
+)
+
+# --- LLM ---
+LLM_REQUEST_SECONDS = Histogram(
+    "tutor_llm_request_duration_seconds", "Upstream LLM call latency", ["model", "outcome"], buckets=_LLM_BUCKETS
+)
+LLM_PROMPT_TOKENS = Counter("tutor_llm_prompt_tokens_total", "Prompt tokens sent upstream", ["model"])
+LLM_COMPLETION_TOKENS = Counter("tutor_llm_completion_tokens_total", "Completion tokens received", ["model"])
+LLM_ERRORS = Counter("tutor_llm_errors_total", "Failed upstream LLM calls", ["model", "kind"])
+LLM_RETRIES = Counter("tutor_llm_retries_total", "LLM calls retried", ["reason"])
+LLM_HEDGES = Counter("tutor_llm_hedges_total", "Hedged LLM requests", ["event"])
+LLM_COALESCED = Counter("tutor_llm_coalesced_total", "LLM calls answered by an identical call already in flight")
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "tutor_llm_queue_wait_seconds", "Time a call waited for the LLM scheduler", ["priority"], buckets=_WAIT_BUCKETS
+)
+LLM_REJECTED = Counter("tutor_llm_rejected_total", "LLM calls turned away because the queue was full", ["priority"])
+
+# --- Quiz generation ---
+QUIZ_GENERATION_ATTEMPTS = Histogram(
+    "tutor_quiz_generation_attempts", "Fan-out attempts used to assemble one quiz", buckets=(1, 2, 3, 4, 5)
+)
+QUIZ_REJECTIONS = Counter(
+    "tutor_quiz_rejections_total", "LLM quiz output or questions that were discarded", ["reason"]
+)
+QUIZ_TOP_UPS = Counter(
+    "tutor_quiz_top_ups_total", "Extra quiz requests started mid-stream to replace rejected questions"
+)
+
+# --- Database pools ---
+DB_POOL_WAIT_SECONDS = Histogram(
+    "tutor_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ["pool"], buckets=_WAIT_BUCKETS
+)
+DB_POOL_IN_USE = Gauge(
+    "tutor_db_pool_connections_in_use", "Pooled connections currently checked out", ["pool"], multiprocess_mode="livesum"
+)
+
+# --- Document extraction ---
+EXTRACTION_SECONDS = Histogram(
+    "tutor_extraction_duration_seconds", "Text extraction time per document", ["file_type", "cache"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+
+
+def _error_kind(error: Exception) -> str:
+    from ai_tutor_platform.llm.scheduler import error_status_code
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    status = error_status_code(error)
+    if status == 429 or type(error).__name__ == "RateLimitError":
+        return "rate_limited"
+    if status is not None:
+        return "server" if status >= 500 else "client"
+    return "other"
+
+
+def observe_llm_call(model: str, seconds: float, prompt: str, response=None, completion: Optional[str] = None,
+                     error: Optional[Exception] = None):
+    """
+    Records one upstream call. Token counts come from the provider's usage metadata when the
+    response carries it, otherwise they are estimated from the text.
+    """
+    if error is not None:
+        LLM_REQUEST_SECONDS.labels(model, "error").observe(seconds)
+        LLM_ERRORS.labels(model, _error_kind(error)).inc()
+        return
+    LLM_REQUEST_SECONDS.labels(model, "ok").observe(seconds)
+    usage = getattr(response, "usage_metadata", None) or {}
+    prompt_tokens = usage.get("input_tokens")
+    completion_tokens = usage.get("output_tokens")
+    if prompt_tokens is None:
+        prompt_tokens = estimate_tokens(prompt)
+    if completion_tokens is None:
+        completion_tokens = estimate_tokens(completion if completion is not None else getattr(response, "content", ""))
+    LLM_PROMPT_TOKENS.labels(model).inc(prompt_tokens)
+    LLM_COMPLETION_TOKENS.labels(model).inc(completion_tokens)
+
+
+def render_metrics():
+    """(body, content type) for the /metrics endpoint."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware, so streaming responses are untouched) that
+    times every HTTP request. Requests are labelled by route template, e.g. /tutor/history,
+    never by raw path, so the number of series stays bounded.
+    """
+    def __init__(self, app, exclude_paths=("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route") # Set by FastAPI once a route matched
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route_path, str(status)).observe(time.perf_counter() - start)
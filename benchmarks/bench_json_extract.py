@@ -0,0 +1,134 @@
+"""
+Micro-benchmark for quiz JSON extraction.
+
+Replays the recorded LLM outputs in benchmarks/data/messy_llm_outputs.jsonl through the
+single-pass extract_json_array and the previous regex cascade, and reports throughput and
+parse-success rate for each. A second section times both on synthetic truncated outputs of
+growing size; the legacy regexes backtrack exponentially there, so each call runs in a
+child process with a time limit.
+
+Usage (from the project root):
+    python -m benchmarks.bench_json_extract [--repeat 200] [--sizes 10,20,30,400] [--timeout 10]
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import time
+
+from ai_tutor_platform.modules.quiz.json_extractor import extract_json_array
+from benchmarks.legacy_json_extract import legacy_extract_json_array
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "messy_llm_outputs.jsonl")
+
+
+def load_corpus(path: str = CORPUS_PATH) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def truncated_output(num_items: int) -> str:
+    """A long quiz cut off before the closing bracket: the worst case for lazy DOTALL regexes."""
+    item = '  {{"question": "Synthetic question {i}?", "options": ["A{i}", "B{i}", "C{i}", "D{i}"], "answer": "C{i}"}}'
+    body = ",\n".join(item.format(i=i) for i in range(num_items))
+    return "[\n" + body[: len(body) * 9 // 10]
+
+
+def count_valid_items(cleaned: str) -> int:
+    """Items that would pass QuizItem validation (4 options, answer among them)."""
+    try:
+        data = json.loads(cleaned)
+    except (json.JSONDecodeError, TypeError):
+        return 0
+    if not isinstance(data, list):
+        return 0
+    valid = 0
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        item = {str(k).strip(): v for k, v in item.items()}
+        options = item.get("options")
+        answer = item.get("answer")
+        if not item.get("question") or not isinstance(options, list) or len(options) != 4 or not isinstance(answer, str):
+            continue
+        if answer.strip(" ,.:;\"").lower() in [str(o).strip(" ,.:;\"").lower() for o in options]:
+            valid += 1
+    return valid
+
+
+def _timed_call(extractor, text, queue):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        cleaned = extractor(text)
+        queue.put((time.perf_counter() - start, count_valid_items(cleaned)))
+
+
+def time_with_limit(extractor, text: str, timeout: float):
+    """Runs one extraction in a child process. Returns (seconds, valid_items), or None on timeout."""
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_timed_call, args=(extractor, text, queue))
+    proc.start()
+    proc.join(timeout)
+    if proc.is_alive():
+        proc.terminate()
+        proc.join()
+        return None
+    return queue.get()
+
+
+def run(extractor, cases: list, repeat: int) -> dict:
+    sink = io.StringIO()
+    per_case = {}
+    total_bytes = sum(len(case["output"].encode("utf-8")) for case in cases)
+    with contextlib.redirect_stdout(sink): # The legacy extractor prints debug output
+        for case in cases:
+            per_case[case["name"]] = count_valid_items(extractor(case["output"]))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for case in cases:
+                extractor(case["output"])
+        elapsed = time.perf_counter() - start
+    parsed = sum(1 for n in per_case.values() if n > 0)
+    return {
+        "per_case": per_case,
+        "parse_success_rate": parsed / len(cases),
+        "valid_items": sum(per_case.values()),
+        "outputs_per_second": repeat * len(cases) / elapsed,
+        "mb_per_second": repeat * total_bytes / elapsed / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the recorded corpus")
+    parser.add_argument("--sizes", default="10,20,30,400", help="question counts for the truncated-output scaling run")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds allowed per call in the scaling run")
+    args = parser.parse_args()
+
+    extractors = {"single_pass": extract_json_array, "legacy_regex": legacy_extract_json_array}
+
+    recorded = load_corpus()
+    print(f"=== recorded corpus: {len(recorded)} outputs x {args.repeat} passes ===")
+    results = {name: run(fn, recorded, args.repeat) for name, fn in extractors.items()}
+    print(f"{'case':<34}" + "".join(f"{name:>16}" for name in extractors))
+    for case in recorded:
+        print(f"{case['name']:<34}" + "".join(f"{results[name]['per_case'][case['name']]:>16}" for name in extractors))
+    print("-" * (34 + 16 * len(extractors)))
+    for metric, fmt in (("parse_success_rate", "{:.0%}"), ("valid_items", "{}"), ("outputs_per_second", "{:,.0f}"), ("mb_per_second", "{:.2f}")):
+        print(f"{metric:<34}" + "".join(f"{fmt.format(results[name][metric]):>16}" for name in extractors))
+
+    print(f"\n=== truncated outputs: seconds per call (valid items), limit {args.timeout:g}s ===")
+    print(f"{'questions':<12}{'bytes':>10}" + "".join(f"{name:>20}" for name in extractors))
+    for size in (int(x) for x in args.sizes.split(",") if x.strip()):
+        text = truncated_output(size)
+        row = f"{size:<12}{len(text):>10}"
+        for fn in extractors.values():
+            timing = time_with_limit(fn, text, args.timeout)
+            row += f"{'timeout':>20}" if timing is None else f"{f'{timing[0]:.4f} ({timing[1]})':>20}"
+        print(row, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Login throughput under concurrent load.
+
+In-process mode (default) needs no database or server. It fires `--logins` password
+checks at `--concurrency` at a time through two async handler models and reports
+throughput, latency percentiles, 503-style rejections and the worst event-loop stall
+(measured by a 10 ms heartbeat task):
+
+- inline: bcrypt called directly inside the coroutine (the old /auth/token behaviour)
+- pool:   bcrypt on the bounded hashing pool (modules/auth/password_hashing.py)
+
+HTTP mode (`--url`) instead posts real logins to a running API with a thread per
+concurrent client, for an end-to-end number.
+
+Usage (from the project root):
+    python -m benchmarks.bench_login_throughput [--logins 200] [--concurrency 50] [--rounds 12]
+    python -m benchmarks.bench_login_throughput --url http://localhost:8000 --username demo --password secret
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from ai_tutor_platform.modules.auth.password_hashing import PasswordHasher, HasherBusyError
+
+PASSWORD = "correct horse battery staple"
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def report(name: str, latencies: list, rejected: int, elapsed: float, max_stall: float = None):
+    row = (
+        f"{name:<10}{len(latencies) / elapsed:>10.1f}{percentile(latencies, 50) * 1000:>10.0f}"
+        f"{percentile(latencies, 95) * 1000:>10.0f}{percentile(latencies, 99) * 1000:>10.0f}{rejected:>10}"
+    )
+    if max_stall is not None:
+        row += f"{max_stall * 1000:>12.0f}"
+    print(row, flush=True)
+
+
+async def _heartbeat(stop: asyncio.Event, stalls: list, interval: float = 0.01):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - start - interval)
+
+
+async def run_in_process(mode: str, context: CryptContext, hashed: str, logins: int, concurrency: int, hasher: PasswordHasher):
+    gate = asyncio.Semaphore(concurrency)
+    latencies, rejected = [], 0
+
+    async def login():
+        nonlocal rejected
+        async with gate:
+            start = time.perf_counter()
+            if mode == "inline":
+                context.verify(PASSWORD, hashed)
+            else:
+                try:
+                    await hasher.verify_and_update(PASSWORD, hashed)
+                except HasherBusyError:
+                    rejected += 1
+                    return
+            latencies.append(time.perf_counter() - start)
+
+    stop, stalls = asyncio.Event(), []
+    heartbeat = asyncio.create_task(_heartbeat(stop, stalls))
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+    return latencies, rejected, elapsed, max(stalls, default=0.0)
+
+
+def run_http(url: str, username: str, password: str, logins: int, concurrency: int):
+    import requests
+
+    session = requests.Session()
+
+    def login(_):
+        start = time.perf_counter()
+        response = session.post(f"{url}/auth/token", data={"username": username, "password": password})
+        return response.status_code, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    latencies = [seconds for code, seconds in results if code == 200]
+    rejected = sum(1 for code, _ in results if code == 503)
+    others = [code for code, _ in results if code not in (200, 503)]
+    if others:
+        print(f"Unexpected status codes: {sorted(set(others))} ({len(others)} responses)")
+    return latencies, rejected, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost for the in-process run")
+    parser.add_argument("--workers", type=int, default=0, help="hashing threads (0 = one per CPU)")
+    parser.add_argument("--max-pending", type=int, default=64)
+    parser.add_argument("--url", help="benchmark a running API instead of the in-process models")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+
+    header = f"{'mode':<10}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rejected':>10}"
+    if args.url:
+        print(f"=== {args.logins} logins against {args.url}, {args.concurrency} concurrent ===")
+        print(header)
+        latencies, rejected, elapsed = run_http(args.url, args.username, args.password, args.logins, args.concurrency)
+        report("http", latencies, rejected, elapsed)
+        return
+
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.rounds)
+    hashed = context.hash(PASSWORD)
+    hasher = PasswordHasher(workers=args.workers or os.cpu_count() or 1, max_pending=args.max_pending, context=context)
+    print(f"=== {args.logins} logins, {args.concurrency} concurrent, bcrypt rounds {args.rounds}, {hasher.workers} hashing threads ===")
+    print(header + f"{'max stall ms':>12}")
+    for mode in ("inline", "pool"):
+        latencies, rejected, elapsed, max_stall = asyncio.run(
+            run_in_process(mode, context, hashed, args.logins, args.concurrency, hasher)
+        )
+        report(mode, latencies, rejected, elapsed, max_stall)
+    hasher.shutdown()
+    print(f"(single hash ~{statistics.mean(timeit_hash(context, hashed)) * 1000:.0f} ms)")
+
+
+def timeit_hash(context: CryptContext, hashed: str, repeat: int = 3) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        context.verify(PASSWORD, hashed)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+if __name__ == "__main__":
+    main()
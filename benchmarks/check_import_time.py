@@ -0,0 +1,101 @@
+"""
+Import-time budget check for API and worker cold starts.
+
+Imports each target module in a fresh interpreter with `python -X importtime`, then
+reports its cumulative import time and the heaviest modules it pulled in. The check
+fails (exit code 1) when a target exceeds its budget, or when it imports a module that
+must stay lazy (PDF/OCR/charting libraries, the Groq client). The API refuses to import
+without SECRET_KEY, so the child interpreters get a throwaway one if it is not set.
+
+Usage (from the project root):
+    python -m benchmarks.check_import_time [--repeat 3] [--top 10] [--budget ai_tutor_platform.main_api=1500]
+"""
+import argparse
+import os
+import re
+import secrets
+import subprocess
+import sys
+
+# Target module -> budget in milliseconds (cumulative import time, best of --repeat runs)
+DEFAULT_BUDGETS_MS = {
+    "ai_tutor_platform.main_api": 1500,
+    "ai_tutor_platform.llm.mistral_chain": 250,
+    "ai_tutor_platform.modules.doubt_solver.file_handler": 300,
+}
+
+# Heavy dependencies that must only be imported on first use
+LAZY_MODULES = ("fitz", "pytesseract", "PIL", "pandas", "altair", "langchain_groq", "scipy")
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str) -> dict:
+    """One cold import of `module`. Returns its cumulative time and every imported module's cumulative time (us)."""
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", secrets.token_urlsafe(48))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+    return {"total_us": cumulative.get(module, 0), "modules": cumulative}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="cold imports per target; the fastest is reported")
+    parser.add_argument("--top", type=int, default=10, help="heaviest imported modules to list per target")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS", help="override or add a target budget")
+    args = parser.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    for item in args.budget:
+        module, _, ms = item.partition("=")
+        budgets[module.strip()] = float(ms)
+
+    failures = []
+    for module, budget_ms in budgets.items():
+        try:
+            runs = [measure(module) for _ in range(max(1, args.repeat))]
+        except RuntimeError as e:
+            failures.append(str(e))
+            print(f"\n{module}: ERROR\n  {e}")
+            continue
+        best = min(runs, key=lambda run: run["total_us"])
+        total_ms = best["total_us"] / 1000
+        status = "ok" if total_ms <= budget_ms else "OVER BUDGET"
+        print(f"\n{module}: {total_ms:.0f} ms (budget {budget_ms:.0f} ms) {status}")
+
+        heaviest = sorted(
+            ((name, us) for name, us in best["modules"].items() if name != module and "." not in name),
+            key=lambda item: item[1],
+            reverse=True
+        )[: args.top]
+        for name, us in heaviest:
+            print(f"  {us / 1000:>8.1f} ms  {name}")
+
+        eager = sorted(name for name in best["modules"] if name.split(".")[0] in LAZY_MODULES)
+        eager_roots = sorted({name.split(".")[0] for name in eager})
+        if eager_roots:
+            print(f"  imported eagerly (should be lazy): {', '.join(eager_roots)}")
+            failures.append(f"{module} imports {', '.join(eager_roots)} at import time")
+        if total_ms > budget_ms:
+            failures.append(f"{module} took {total_ms:.0f} ms (budget {budget_ms:.0f} ms)")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nAll import-time budgets met.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Verbatim copy of the regex-cascade extract_json_array that shipped before the
+single-pass scanner, kept only as the baseline for bench_json_extract.py.
+"""
+import re
+
+
+def legacy_extract_json_array(text: str) -> str:
+    # Remove common LLM non-JSON elements like code blocks.
+    # Updated regex to be more robust for potential surrounding text.
+    # It attempts to find the first JSON array.
+    
+    # Attempt to remove code block markers first
+    text = re.sub(r"```(?:json)?", "", text, flags=re.DOTALL).strip()
+
+    # Look for a top-level JSON array
+    match = re.search(r'\[\s*\{.*?\}\s*\]', text, re.DOTALL)
+    if not match:
+        # If a full array isn't found, try to find a list of objects
+        # This might capture partial output but could be useful for debugging
+        match = re.search(r'(\[\s*\{.*?\}\s*(?:,\s*\{.*?\}\s*)*\])', text, re.DOTALL)
+        if not match:
+            # If still no array, try to find individual objects and wrap them (risky)
+            # This is a last resort to try and salvage something
+            objects = re.findall(r'\{\s*".*?":\s*".*?".*?\}', text, re.DOTALL)
+            if objects:
+                text = f"[{','.join(objects)}]" # Wrap found objects in an array
+                match = re.search(r'\[\s*\{.*?\}\s*\]', text, re.DOTALL)
+                if not match: return "" # Still no valid array
+            else:
+                return "" # No JSON-like structure found at all
+
+    json_str = match.group(0) if match else "" # Ensure json_str is empty if no match
+
+    # Fix common formatting issues
+    json_str = re.sub(r",\s*}", "}", json_str)
+    json_str = re.sub(r",\s*]", "]", json_str)
+    json_str = json_str.replace("“", '"').replace("”", '"').replace("‘", "'").replace("’", "'")
+    # This regex attempts to fix escaped quotes that might be doubled or malformed.
+    # More aggressively, it handles some common LLM quirks, but can be brittle.
+    json_str = re.sub(r'(?<!\\)"(?!\\)', r'\"', json_str) # Escape unescaped double quotes that are not part of valid JSON structure. (This might be too aggressive)
+    json_str = re.sub(r"\\\"", r'"', json_str) # Correct already escaped quotes
+    json_str = re.sub(r'\\(?![ntr"\\/bfu])', r'\\\\', json_str) # Escape backslashes correctly for JSON
+
+    # Add a check for empty string or non-JSON-like string after cleaning
+    if not json_str.strip() or not (json_str.strip().startswith('[') and json_str.strip().endswith(']')):
+        print(f"DEBUG: extract_json_array returning empty/malformed after cleaning. Final string: '{json_str}'")
+        return "" # Return empty string if it's clearly not a JSON array
+
+    return json_str
@@ -0,0 +1,210 @@
+"""
+OpenAI/Groq-compatible stub LLM server for load tests.
+
+Serves POST /openai/v1/chat/completions (plain and `stream: true` SSE) with synthetic
+answers, so the API can be load tested offline without spending provider quota. Each
+call waits a time-to-first-token drawn from a lognormal distribution, then "generates"
+its completion at `--tokens-per-second`. Quiz prompts ("Generate exactly N multiple-choice
+questions on the topic '...'") get a JSON array of well-formed questions; `--bad-item-rate`
+breaks a share of them so quiz validation and top-ups get exercised. Errors and 429s
+can be injected at fixed rates.
+
+Usage (from the project root):
+    python -m benchmarks.loadtest.stub_llm [--port 9100] [--ttft-ms 300] [--ttft-sigma 0.5] [--tokens-per-second 250]
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+QUIZ_PATTERN = re.compile(r"Generate exactly (\d+) multiple-choice questions on the topic '(.*)'\.")
+FILLER = (
+    "Let's work through this step by step. First recall the definition, then apply it to "
+    "the example, and finally check the result against what we expect. "
+)
+
+
+class StubSettings:
+    def __init__(self, ttft_ms: float, ttft_sigma: float, tokens_per_second: float, completion_tokens: int,
+                 error_rate: float, rate_limit_rate: float, bad_item_rate: float, seed: int = None):
+        self.ttft_ms = ttft_ms
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.bad_item_rate = bad_item_rate
+        self.random = random.Random(seed)
+
+    def ttft(self) -> float:
+        """Seconds before the first token: lognormal with median `ttft_ms`."""
+        return self.random.lognormvariate(math.log(max(self.ttft_ms, 1) / 1000), self.ttft_sigma)
+
+    def token_interval(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _quiz_item(topic: str, index: int, settings: StubSettings) -> dict:
+    options = [f"{topic} fact {index}{letter}" for letter in "ABCD"]
+    item = {
+        "question": f"Which statement about {topic} is correct? (#{index})",
+        "options": options,
+        "answer": settings.random.choice(options)
+    }
+    if settings.random.random() < settings.bad_item_rate:
+        # The failure modes quiz validation sees from real models
+        flaw = settings.random.choice(("answer", "options", "field"))
+        if flaw == "answer":
+            item["answer"] = f"None of the above ({index})"
+        elif flaw == "options":
+            item["options"] = options[:3]
+        else:
+            del item["question"]
+    return item
+
+
+def completion_text(prompt: str, settings: StubSettings, json_object: bool = False) -> str:
+    match = QUIZ_PATTERN.search(prompt)
+    if match:
+        num, topic = int(match.group(1)), match.group(2)
+        items = [_quiz_item(topic, settings.random.randrange(1_000_000), settings) for _ in range(num)]
+        # Structured-output prompts ask for {"questions": [...]}, as does JSON mode
+        if json_object or '"questions"' in prompt:
+            return json.dumps({"questions": items}, indent=2)
+        return json.dumps(items, indent=2)
+    chars = 4 * max(1, int(settings.random.expovariate(1 / max(1, settings.completion_tokens))))
+    return (FILLER * (chars // len(FILLER) + 1))[:chars].rstrip()
+
+
+def _chunks(text: str, size: int = 16):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def create_app(settings: StubSettings) -> FastAPI:
+    app = FastAPI(title="Stub LLM")
+    app.state.stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.stats["requests"] += 1
+        model = body.get("model", "stub")
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+
+        roll = settings.random.random()
+        if roll < settings.rate_limit_rate:
+            app.state.stats["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429, headers={"retry-after": "1"}
+            )
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            app.state.stats["errors"] += 1
+            await asyncio.sleep(settings.ttft())
+            return JSONResponse({"error": {"message": "Internal server error (stub)", "type": "internal_server_error"}}, status_code=500)
+
+        json_object = (body.get("response_format") or {}).get("type") == "json_object"
+        text = completion_text(prompt, settings, json_object)
+        usage = {
+            "prompt_tokens": _estimate_tokens(prompt),
+            "completion_tokens": _estimate_tokens(text),
+            "total_tokens": _estimate_tokens(prompt) + _estimate_tokens(text)
+        }
+        call_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(settings.ttft() + usage["completion_tokens"] * settings.token_interval())
+            return {
+                "id": call_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage
+            }
+
+        async def events():
+            def chunk(delta: dict, finish_reason=None, **extra) -> str:
+                payload = {
+                    "id": call_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra
+                }
+                return f"data: {json.dumps(payload)}\n\n"
+
+            await asyncio.sleep(settings.ttft())
+            yield chunk({"role": "assistant", "content": ""})
+            for piece in _chunks(text):
+                yield chunk({"content": piece})
+                await asyncio.sleep(_estimate_tokens(piece) * settings.token_interval())
+            yield chunk({}, "stop", x_groq={"usage": usage})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Stub settings, shared with run_loadtest so it can pass them through."""
+    parser.add_argument("--ttft-ms", type=float, default=300, help="Median time to first token")
+    parser.add_argument("--ttft-sigma", type=float, default=0.5, help="Lognormal sigma of the time to first token (0 = fixed)")
+    parser.add_argument("--tokens-per-second", type=float, default=250, help="Generation speed after the first token (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int, default=250, help="Mean length of tutor answers in tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of calls answered 429")
+    parser.add_argument("--bad-item-rate", type=float, default=0.0, help="Share of quiz items that fail validation")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def settings_from_args(args: argparse.Namespace) -> StubSettings:
+    return StubSettings(
+        ttft_ms=args.ttft_ms,
+        ttft_sigma=args.ttft_sigma,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        bad_item_rate=args.bad_item_rate,
+        seed=args.seed
+    )
+
+
+def stub_argv(args: argparse.Namespace) -> list:
+    """Command-line flags that recreate `args`' stub settings in a child process."""
+    argv = []
+    for name in ("ttft_ms", "ttft_sigma", "tokens_per_second", "completion_tokens", "error_rate", "rate_limit_rate", "bad_item_rate", "seed"):
+        value = getattr(args, name)
+        if value is not None:
+            argv += [f"--{name.replace('_', '-')}", str(value)]
+    return argv
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(settings_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ setup(
     long_description=open("README.md").read(),
     long_description_content_type="text/markdown",
     url="https://github.com/your_username/ai_tutor_platform",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     classifiers=[
         "Programming Language :: Python :: 3",
         "Framework :: FastAPI",
@@ -30,6 +30,10 @@ setup(
         "Pillow",           
         "pytesseract",       
         "altair",           
-        "pandas"            
+        "pandas",
+        "numpy",
+        "scipy",
+        "asyncpg",
+        "prometheus_client"
     ]
 )